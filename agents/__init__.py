@@ -1,10 +1,17 @@
+import functools
+from config import settings
+
+# Resolved once per process; defined before the builder imports that read it
+NVIDIA_LLM = f"nvidia_nim/{settings.NVIDIA_MODEL}"
+
 from .coordinator_agent import CoordinatorAgentBuilder
 from .triage_agent import TriageAgentBuilder
 from .surveillance_agent import SurveillanceAgentBuilder
 from .alert_agent import AlertAgentBuilder
 
+@functools.lru_cache(maxsize=1)
 def build_all_agents():
-    """Build and return all agents"""
+    """Build and return all agents (built once per process)"""
     return {
         'coordinator': CoordinatorAgentBuilder().build(),
         'triage': TriageAgentBuilder().build(),
@@ -17,5 +24,6 @@ __all__ = [
     'TriageAgentBuilder',
     'SurveillanceAgentBuilder',
     'AlertAgentBuilder',
-    'build_all_agents'
+    'build_all_agents',
+    'NVIDIA_LLM'
 ]
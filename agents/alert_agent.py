@@ -1,6 +1,24 @@
 from crewai import Agent
 from config import settings
 from utils import log
+from tools import send_telegram_message, broadcast_telegram_message, write_alert_log
+from agents import NVIDIA_LLM
+
+# Static prompt text, built once at import and shared by every build()
+_ALERT_GOAL = """Create and send clear, empathetic health alerts and notifications.
+            
+            COMMUNICATION PROTOCOL:
+            1. Translate medical findings into simple language
+            2. Be empathetic and reassuring
+            3. Provide actionable recommendations
+            4. Use appropriate urgency level
+            5. Include emergency contact info when needed
+            
+            Write messages that are easy to understand and act upon."""
+
+_ALERT_BACKSTORY = """You are a crisis communication specialist with expertise 
+            in public health messaging. You translate complex medical information 
+            into clear, actionable guidance that helps people make informed decisions."""
 
 
 class AlertAgentBuilder:
@@ -10,9 +28,7 @@ class AlertAgentBuilder:
     
     def __init__(self):
         # ✅ Changed from Gemini to NVIDIA NIM
-        self.llm = f"nvidia_nim/{settings.NVIDIA_MODEL}"
-        
-        from tools import send_telegram_message, broadcast_telegram_message, write_alert_log
+        self.llm = NVIDIA_LLM
         
         self.tools = [
             send_telegram_message,
@@ -26,22 +42,11 @@ class AlertAgentBuilder:
         return Agent(
             role="Public Health Communication Specialist",
             
-            goal="""Create and send clear, empathetic health alerts and notifications.
-            
-            COMMUNICATION PROTOCOL:
-            1. Translate medical findings into simple language
-            2. Be empathetic and reassuring
-            3. Provide actionable recommendations
-            4. Use appropriate urgency level
-            5. Include emergency contact info when needed
-            
-            Write messages that are easy to understand and act upon.""",
+            goal=_ALERT_GOAL,
             
-            backstory="""You are a crisis communication specialist with expertise 
-            in public health messaging. You translate complex medical information 
-            into clear, actionable guidance that helps people make informed decisions.""",
+            backstory=_ALERT_BACKSTORY,
             
-            verbose=True,
+            verbose=settings.DEBUG,
             allow_delegation=False,
             llm=self.llm,
             tools=self.tools,
@@ -1,6 +1,21 @@
 from crewai import Agent
 from config.settings import settings
 from utils.logger import log
+from agents import NVIDIA_LLM
+
+# Static prompt text, built once at import and shared by every build()
+_COORDINATOR_GOAL = """Route health messages to the Medical Symptom Triage Specialist.
+            
+            When you see symptoms, delegate to "Medical Symptom Triage Specialist".
+            
+            Pass task as a STRING, context as a STRING, coworker as a STRING.
+            Example:
+            - task: "Assess symptoms"
+            - context: "User has fever 103F and cough"
+            - coworker: "Medical Symptom Triage Specialist"
+            """
+
+_COORDINATOR_BACKSTORY = """You route patient cases to the right specialist."""
 
 
 class CoordinatorAgentBuilder:
@@ -8,7 +23,7 @@ class CoordinatorAgentBuilder:
     
     def __init__(self):
         # ✅ Changed from Gemini to NVIDIA NIM
-        self.llm = f"nvidia_nim/{settings.NVIDIA_MODEL}"
+        self.llm = NVIDIA_LLM
         self.tools = []
     
     def build(self) -> Agent:
@@ -17,20 +32,11 @@ class CoordinatorAgentBuilder:
         return Agent(
             role="Health Surveillance Coordinator & System Orchestrator",
             
-            goal="""Route health messages to the Medical Symptom Triage Specialist.
-            
-            When you see symptoms, delegate to "Medical Symptom Triage Specialist".
-            
-            Pass task as a STRING, context as a STRING, coworker as a STRING.
-            Example:
-            - task: "Assess symptoms"
-            - context: "User has fever 103F and cough"
-            - coworker: "Medical Symptom Triage Specialist"
-            """,
+            goal=_COORDINATOR_GOAL,
             
-            backstory="""You route patient cases to the right specialist.""",
+            backstory=_COORDINATOR_BACKSTORY,
             
-            verbose=True,
+            verbose=settings.DEBUG,
             allow_delegation=True,
             llm=self.llm,
             tools=self.tools,
@@ -1,6 +1,24 @@
 from crewai import Agent
 from config import settings
 from utils import log
+from tools import get_recent_symptoms, detect_spike, write_alert_log
+
+# Static prompt text, built once at import and shared by every build()
+_SURVEILLANCE_GOAL = """Monitor population health data for disease outbreak patterns.
+            
+            ANALYSIS PROTOCOL:
+            1. Retrieve recent symptom reports
+            2. Identify symptom clusters
+            3. Detect statistical spikes
+            4. Calculate outbreak probability
+            5. Create alerts for concerning patterns
+            
+            Use epidemiological methods and statistical analysis."""
+
+_SURVEILLANCE_BACKSTORY = """You are a CDC-trained epidemiologist specializing in 
+            infectious disease surveillance and outbreak detection. You use 
+            statistical methods to identify emerging health threats."""
+
 
 class SurveillanceAgentBuilder:
     """
@@ -11,9 +29,6 @@ class SurveillanceAgentBuilder:
         # Use Llama 3.2 3B via Ollama for medical pattern detection
         self.llm = f"ollama/{settings.LLM_MODEL}"
         
-        # Import tools
-        from tools import get_recent_symptoms, detect_spike, write_alert_log
-        
         self.tools = [
             get_recent_symptoms,
             detect_spike,
@@ -26,22 +41,11 @@ class SurveillanceAgentBuilder:
         return Agent(
             role="Epidemiological Surveillance Analyst",
             
-            goal="""Monitor population health data for disease outbreak patterns.
+            goal=_SURVEILLANCE_GOAL,
             
-            ANALYSIS PROTOCOL:
-            1. Retrieve recent symptom reports
-            2. Identify symptom clusters
-            3. Detect statistical spikes
-            4. Calculate outbreak probability
-            5. Create alerts for concerning patterns
-            
-            Use epidemiological methods and statistical analysis.""",
-            
-            backstory="""You are a CDC-trained epidemiologist specializing in 
-            infectious disease surveillance and outbreak detection. You use 
-            statistical methods to identify emerging health threats.""",
+            backstory=_SURVEILLANCE_BACKSTORY,
             
-            verbose=True,
+            verbose=settings.DEBUG,
             allow_delegation=False,
             llm=self.llm,
             tools=self.tools,
@@ -1,6 +1,22 @@
 from crewai import Agent
 from config.settings import settings
 from utils.logger import log
+from tools import write_health_record, send_telegram_message
+
+# Static prompt text, built once at import and shared by every build()
+_TRIAGE_GOAL = """You MUST use your tools. Do NOT just write what you would do.
+            
+            STEP 1: Call write_health_record tool
+            STEP 2: Call send_telegram_message tool
+            
+            These are ACTIONS you must take, not descriptions."""
+
+_TRIAGE_BACKSTORY = """You are an emergency physician who ALWAYS:
+            1. Saves patient records using write_health_record
+            2. Sends assessments using send_telegram_message
+            
+            You do this by CALLING TOOLS, not describing them."""
+
 
 class TriageAgentBuilder:
     """Triage Agent - Uses Llama for medical analysis"""
@@ -9,8 +25,6 @@ class TriageAgentBuilder:
         # Keep Ollama
         self.llm = f"ollama/{settings.OLLAMA_MODEL}"
         
-        from tools import write_health_record, send_telegram_message
-        
         self.tools = [
             write_health_record,
             send_telegram_message
@@ -22,20 +36,11 @@ class TriageAgentBuilder:
         return Agent(
             role="Medical Symptom Triage Specialist",
             
-            goal="""You MUST use your tools. Do NOT just write what you would do.
-            
-            STEP 1: Call write_health_record tool
-            STEP 2: Call send_telegram_message tool
-            
-            These are ACTIONS you must take, not descriptions.""",
-            
-            backstory="""You are an emergency physician who ALWAYS:
-            1. Saves patient records using write_health_record
-            2. Sends assessments using send_telegram_message
+            goal=_TRIAGE_GOAL,
             
-            You do this by CALLING TOOLS, not describing them.""",
+            backstory=_TRIAGE_BACKSTORY,
             
-            verbose=True,
+            verbose=settings.DEBUG,
             allow_delegation=False,
             llm=self.llm,
             tools=self.tools,
@@ -1,20 +1,57 @@
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from config import settings
 from config.mongo import db
 from utils import log
-from api.telegram_webhook import telegram_router, telegram_app
+from utils.http_client import get_shared_httpx, close_shared_httpx
+from api.telegram_webhook import telegram_router, telegram_app, prime_welcome_cache
 from api.scheduler import start_scheduler, shutdown_scheduler
-from database import RiskLevel
+from api.voice_to_text import shutdown_voice_pool
+from crew import get_health_crew
+from database import RiskLevel, init_db
 import uvicorn
+import asyncio
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from builtins import Exception, str
 
 users_collection = db["users"]
 health_records_collection = db["health_records"]
 alerts_collection = db["alerts"]
 
+# Plain string values, resolved once instead of through the Enum per request
+_RISK_LEVELS = tuple(level.value for level in RiskLevel)
+
+# /stats is polled by monitors; serve counts from memory for this long
+STATS_CACHE_TTL_SECONDS = 10
+
+
+async def _warm_up_llms(health_crew):
+    """Pay LLM connect/model-load costs at boot instead of on the first user request"""
+    loop = asyncio.get_running_loop()
+    
+    async def _warm_nvidia():
+        await loop.run_in_executor(None, health_crew.llm.call, "ping")
+    
+    async def _warm_ollama():
+        # An empty generate request loads the model; keep_alive=-1 keeps it resident
+        response = await get_shared_httpx().post(
+            f"{settings.OLLAMA_BASE_URL}/api/generate",
+            json={"model": settings.OLLAMA_MODEL, "keep_alive": -1},
+            timeout=120.0,
+        )
+        response.raise_for_status()
+    
+    results = await asyncio.gather(_warm_nvidia(), _warm_ollama(), return_exceptions=True)
+    for name, result in zip(("NVIDIA NIM", "Ollama"), results):
+        if isinstance(result, Exception):
+            log.warning(f"⚠️ {name} warm-up failed: {result}")
+        else:
+            log.info(f"🔥 {name} warmed up")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Lifespan context manager for startup and shutdown events"""
@@ -22,6 +59,14 @@ async def lifespan(app: FastAPI):
     log.info(f"🚀 Starting {settings.APP_NAME}...")
     
     log.info("📊 MongoDB client ready")
+    await init_db()
+    
+    # One bounded pool for every blocking call (crew runs, sync HTTP, etc.)
+    executor = ThreadPoolExecutor(
+        max_workers=min(32, (os.cpu_count() or 1) * 4),
+        thread_name_prefix="swasthai",
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
     
     # Create necessary directories
     os.makedirs(settings.BASE_DIR / "logs", exist_ok=True)
@@ -45,10 +90,29 @@ async def lifespan(app: FastAPI):
             "then restart the server."
         )
     
-    # Start background scheduler
-    log.info("⏰ Starting background scheduler...")
-    start_scheduler()
-    log.info("✅ Scheduler started")
+    # Build the crew once; scheduler jobs and warm-up share this instance
+    log.info("🤖 Building HealthCrew...")
+    app.state.crew = None
+    app.state.warmup_task = None
+    try:
+        app.state.crew = await asyncio.get_running_loop().run_in_executor(None, get_health_crew)
+    except Exception as crew_error:
+        log.exception(f"❌ HealthCrew build failed: {crew_error}")
+        log.warning(
+            "Continuing without scheduler and LLM warm-up; message handlers "
+            "will retry building the crew on demand."
+        )
+    
+    if app.state.crew is not None:
+        # Start background scheduler
+        log.info("⏰ Starting background scheduler...")
+        start_scheduler(app.state.crew)
+        log.info("✅ Scheduler started")
+        
+        # Warm LLM endpoints in the background so startup isn't held up
+        app.state.warmup_task = asyncio.create_task(_warm_up_llms(app.state.crew))
+    # Same for the translated welcome messages
+    app.state.welcome_task = asyncio.create_task(asyncio.to_thread(prime_welcome_cache))
     
     log.info(f"✅ {settings.APP_NAME} is ready!")
     
@@ -56,12 +120,18 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     log.info(f"🛑 Shutting down {settings.APP_NAME}...")
+    if app.state.warmup_task is not None:
+        app.state.warmup_task.cancel()
+    app.state.welcome_task.cancel()
     shutdown_scheduler()
     if telegram_initialized:
         await telegram_app.stop()
         await telegram_app.shutdown()
     else:
         log.info("⏹️ Telegram bot was not running; skipping shutdown")
+    await close_shared_httpx()
+    shutdown_voice_pool()
+    executor.shutdown(wait=False)
     log.info("✅ Shutdown complete")
 
 # Create FastAPI app
@@ -69,7 +139,8 @@ app = FastAPI(
     title="SwasthAI - Autonomous Health Intelligence Network",
     description="Multi-agent health surveillance system using CrewAI",
     version="3.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # CORS middleware
@@ -84,6 +155,9 @@ app.add_middleware(
 # Include routers
 app.include_router(telegram_router, prefix="/webhook", tags=["telegram"])
 
+# (expires_at, payload) for the last successful /stats computation
+app.state.stats_cache = (0.0, None)
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -121,19 +195,30 @@ async def health_check():
 
 @app.get("/stats")
 async def get_stats():
-    """Get system statistics"""
+    """Get system statistics (cached for STATS_CACHE_TTL_SECONDS)"""
+    expires_at, cached = app.state.stats_cache
+    if cached is not None and time.monotonic() < expires_at:
+        return cached
+    
     try:
-        total_users = await users_collection.count_documents({})
-        total_records = await health_records_collection.count_documents({})
-        total_alerts = await alerts_collection.count_documents({})
+        # Dispatch all counts concurrently; the risk distribution is computed
+        # server-side in a single aggregation instead of one count per level
+        total_users, total_records, total_alerts, risk_groups = await asyncio.gather(
+            users_collection.count_documents({}),
+            health_records_collection.count_documents({}),
+            alerts_collection.count_documents({}),
+            health_records_collection.aggregate(
+                # Stored levels are uppercase ("HIGH"); fold case to match _RISK_LEVELS
+                [{"$group": {"_id": {"$toLower": "$risk_level"}, "n": {"$sum": 1}}}]
+            ).to_list(length=None),
+        )
         
-        risk_counts = {}
-        for level in RiskLevel:
-            risk_counts[level.value] = await health_records_collection.count_documents(
-                {"risk_level": level.value}
-            )
+        risk_counts = dict.fromkeys(_RISK_LEVELS, 0)
+        for group in risk_groups:
+            if group["_id"] in risk_counts:
+                risk_counts[group["_id"]] = group["n"]
         
-        return {
+        stats = {
             "total_users": total_users,
             "total_health_records": total_records,
             "total_alerts": total_alerts,
@@ -146,6 +231,8 @@ async def get_stats():
                 "alert": "active"
             }
         }
+        app.state.stats_cache = (time.monotonic() + STATS_CACHE_TTL_SECONDS, stats)
+        return stats
     except Exception as e:
         log.error(f"Error fetching stats: {str(e)}")
         return {"status": "error", "message": str(e)}
@@ -156,5 +243,7 @@ if __name__ == "__main__":
         host=settings.API_HOST,
         port=settings.API_PORT,
         reload=settings.DEBUG,
-        log_level=settings.LOG_LEVEL.lower()
+        log_level=settings.LOG_LEVEL.lower(),
+        loop="auto",  # uvloop when installed (not available on Windows)
+        http="httptools"
     )
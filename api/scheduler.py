@@ -1,136 +1,219 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.interval import IntervalTrigger
 from datetime import datetime
 import asyncio
+import functools
 from config import settings
 from config.mongo import db
 from utils import log
-from crew import get_health_crew
-import atexit
+from api.voice_to_text import sweep_temp_audio
 
-# Global scheduler instance
+# Global scheduler instance (running interval tasks)
 scheduler = None
+
+# HealthCrew handed over by start_scheduler; jobs read it directly
+_health_crew = None
 health_records_collection = db["health_records"]
 
+# Newest health record _id seen by the last successful surveillance run
+_last_surveillance_max_id = None
+
+
+# Only the fields the follow-up dispatch actually reads
+_FOLLOWUP_PROJECTION = {
+    "telegram_id": 1,
+    "symptoms": 1,
+    "risk_level": 1,
+    "severity_score": 1,
+    "reported_at": 1,
+    "recommendations": 1,
+    "_id": 0,
+}
 
-async def _find_followups_due(limit: int = 50):
+
+def _find_followups_due(limit: int = 50):
+    """Return a cursor over due follow-ups (served by followups_due_idx)"""
     now = datetime.utcnow()
-    cursor = health_records_collection.find(
-        {
-            "requires_followup": True,
-            "followup_completed": False,
-            "followup_date": {"$lte": now},
-        }
-    ).limit(limit)
-    return await cursor.to_list(length=limit)
+    return (
+        health_records_collection.find(
+            {
+                "requires_followup": True,
+                "followup_completed": False,
+                "followup_date": {"$lte": now},
+            },
+            projection=_FOLLOWUP_PROJECTION,
+        )
+        .limit(limit)
+        .batch_size(limit)
+    )
 
-def run_scheduled_surveillance():
+async def run_scheduled_surveillance():
     """
     Run surveillance analysis on schedule.
     
     This function is called periodically to check for disease patterns.
+    The blocking crew run is offloaded to the default executor so it does
+    not stall the event loop. Ticks with no new health records are skipped.
     """
+    global _last_surveillance_max_id
+    
     log.info("⏰ Running scheduled surveillance analysis...")
     
     try:
-        health_crew = get_health_crew()
+        latest = await health_records_collection.find_one(
+            sort=[("_id", -1)], projection={"_id": 1}
+        )
+        latest_id = latest["_id"] if latest else None
+        if latest_id == _last_surveillance_max_id:
+            log.info("No new health records since last surveillance run - skipping")
+            return
         
-        result = health_crew.run_surveillance_analysis(
-            time_window_hours=settings.SPIKE_WINDOW_HOURS
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(
+            None,
+            functools.partial(
+                _health_crew.run_surveillance_analysis,
+                time_window_hours=settings.SPIKE_WINDOW_HOURS,
+            ),
         )
         
         if result.get("escalation"):
             log.warning(f"🚨 Escalation detected in scheduled surveillance!")
         else:
             log.info("✅ Scheduled surveillance complete - No anomalies")
+        
+        _last_surveillance_max_id = latest_id
             
     except Exception as e:
         log.error(f"❌ Error in scheduled surveillance: {str(e)}")
 
-def run_scheduled_followups():
+async def _dispatch_followup(record, now_iso: str):
+    """Run one follow-up check on the shared default executor"""
+    telegram_id = record.get("telegram_id")
+    if not telegram_id:
+        log.warning("Skipping follow-up without telegram_id")
+        return
+    
+    try:
+        reported_at = record.get("reported_at")
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None,
+            functools.partial(
+                _health_crew.execute_followup_check,
+                user_id=telegram_id,
+                telegram_id=telegram_id,
+                previous_assessment={
+                    "symptoms": record.get("symptoms", []),
+                    "risk_level": record.get("risk_level", "moderate"),
+                    "severity_score": record.get("severity_score", 0),
+                    "reported_at": reported_at.isoformat() if reported_at else now_iso,
+                    "recommendations": record.get("recommendations", []),
+                },
+                followup_type="scheduled",
+            ),
+        )
+        
+        log.info(f"✅ Follow-up sent to {telegram_id}")
+    
+    except Exception as e:
+        log.error(f"Error sending follow-up to user {telegram_id}: {str(e)}")
+
+async def _followup_worker(queue: asyncio.Queue, now_iso: str):
+    """Consume due records from the queue until cancelled"""
+    while True:
+        record = await queue.get()
+        try:
+            await _dispatch_followup(record, now_iso)
+        finally:
+            queue.task_done()
+
+async def run_scheduled_followups():
     """
     Check for users requiring follow-up and send messages.
+    
+    Records are streamed from the cursor into a queue drained by
+    settings.FOLLOWUP_CONCURRENCY workers, so dispatch starts on the first
+    record and concurrency stays within the LLM provider rate limit.
     """
     log.info("⏰ Checking for scheduled follow-ups...")
     
     try:
-        records = asyncio.run(_find_followups_due())
-        
-        if not records:
-            log.info("No follow-ups due at this time")
-            return
-        
-        log.info(f"Found {len(records)} follow-ups due")
+        # Fallback timestamp for records missing reported_at, taken once per tick
+        now_iso = datetime.utcnow().isoformat()
+        queue = asyncio.Queue(maxsize=settings.FOLLOWUP_CONCURRENCY)
+        workers = [
+            asyncio.create_task(_followup_worker(queue, now_iso))
+            for _ in range(settings.FOLLOWUP_CONCURRENCY)
+        ]
         
-        health_crew = get_health_crew()
+        found = 0
+        try:
+            async for record in _find_followups_due():
+                found += 1
+                await queue.put(record)
+            await queue.join()
+        finally:
+            for worker in workers:
+                worker.cancel()
         
-        for record in records:
-            try:
-                telegram_id = record.get("telegram_id")
-                if not telegram_id:
-                    log.warning("Skipping follow-up without telegram_id")
-                    continue
-                
-                health_crew.execute_followup_check(
-                    user_id=telegram_id,
-                    telegram_id=telegram_id,
-                    previous_assessment={
-                        "symptoms": record.get("symptoms", []),
-                        "risk_level": record.get("risk_level", "moderate"),
-                        "severity_score": record.get("severity_score", 0),
-                        "reported_at": record.get("reported_at", datetime.utcnow()).isoformat(),
-                        "recommendations": record.get("recommendations", []),
-                    },
-                    followup_type="scheduled",
-                )
-                
-                log.info(f"✅ Follow-up sent to {telegram_id}")
-            
-            except Exception as e:
-                log.error(f"Error sending follow-up to user {record.get('telegram_id')}: {str(e)}")
-                continue
+        if found:
+            log.info(f"Processed {found} follow-ups")
+        else:
+            log.info("No follow-ups due at this time")
                     
     except Exception as e:
         log.error(f"❌ Error in scheduled follow-ups: {str(e)}")
 
-def start_scheduler():
+async def run_temp_audio_sweep():
+    """Remove leaked temp audio files older than an hour"""
+    removed = await asyncio.to_thread(sweep_temp_audio, 3600)
+    if removed:
+        log.info(f"🗑️ Swept {removed} stale temp audio files")
+
+async def _interval(job, seconds: int, run_first: bool = False):
+    """Run `job` every `seconds` on the event loop until cancelled"""
+    if not run_first:
+        await asyncio.sleep(seconds)
+    while True:
+        try:
+            await job()
+        except Exception:
+            log.exception(f"❌ Scheduled job {job.__name__} failed")
+        await asyncio.sleep(seconds)
+
+def start_scheduler(health_crew):
     """
     Start the background scheduler for periodic tasks.
+    
+    Must be called from within the running FastAPI event loop (lifespan):
+    each job is a plain asyncio task sharing the loop and its Motor
+    connection pool, with blocking work going through the loop's default
+    executor.
+    
+    Args:
+        health_crew: HealthCrew instance built once at startup
     """
-    global scheduler
+    global scheduler, _health_crew
     
     if scheduler is not None:
         log.warning("Scheduler already running")
         return
     
-    scheduler = BackgroundScheduler()
-    
-    # Schedule surveillance every X minutes
-    scheduler.add_job(
-        func=run_scheduled_surveillance,
-        trigger=IntervalTrigger(minutes=settings.SURVEILLANCE_INTERVAL_MINUTES),
-        id='surveillance_job',
-        name='Run surveillance analysis',
-        replace_existing=True
-    )
-    
-    # Schedule follow-up checks every 15 minutes
-    scheduler.add_job(
-        func=run_scheduled_followups,
-        trigger=IntervalTrigger(minutes=15),
-        id='followup_job',
-        name='Check scheduled follow-ups',
-        replace_existing=True
-    )
-    
-    scheduler.start()
+    _health_crew = health_crew
+    scheduler = [
+        # Surveillance every X minutes
+        asyncio.create_task(
+            _interval(run_scheduled_surveillance, settings.SURVEILLANCE_INTERVAL_MINUTES * 60)
+        ),
+        # Follow-up checks every 15 minutes
+        asyncio.create_task(_interval(run_scheduled_followups, 15 * 60)),
+        # Temp audio sweep at startup and every 30 minutes
+        asyncio.create_task(_interval(run_temp_audio_sweep, 30 * 60, run_first=True)),
+    ]
     
     log.info(f"✅ Scheduler started:")
     log.info(f"   - Surveillance: Every {settings.SURVEILLANCE_INTERVAL_MINUTES} minutes")
     log.info(f"   - Follow-ups: Every 15 minutes")
-    
-    # Shut down scheduler on exit
-    atexit.register(lambda: shutdown_scheduler())
+    log.info(f"   - Temp audio sweep: Every 30 minutes")
 
 def shutdown_scheduler():
     """
@@ -139,6 +222,7 @@ def shutdown_scheduler():
     global scheduler
     
     if scheduler is not None:
-        scheduler.shutdown()
+        for task in scheduler:
+            task.cancel()
         scheduler = None
         log.info("✅ Scheduler shut down")
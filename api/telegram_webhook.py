@@ -1,5 +1,5 @@
 from typing import Optional
-from fastapi import APIRouter, Header, Request
+from fastapi import APIRouter, Header, HTTPException, Request
 from telegram import InlineKeyboardMarkup, Update,InlineKeyboardButton
 from telegram.ext import (
     Application,
@@ -16,31 +16,48 @@ import httpx
 from config import settings
 from config.mongo import db
 from utils import log
+from utils.http_client import get_shared_httpx
 from crew import get_health_crew
-from database import User, Session, SessionState, RiskLevel
-from datetime import datetime
-from pymongo import DESCENDING
-import json
+from database import Session, SessionState, RiskLevel
+from datetime import datetime, timezone
+from pymongo import DESCENDING, ReturnDocument
+import orjson
+import hmac
 from api.image_analyzer import analyze_medical_image
-from api.voice_to_text import transcribe_audio
-import uuid
-import tempfile
+from api.voice_to_text import transcribe_audio_bytes
+from io import BytesIO
+from collections import deque
+from cachetools import TTLCache
+import asyncio
 import os
+import tempfile
 # Create router
 telegram_router = APIRouter()
 
 
 class CustomHTTPXRequest(HTTPXRequest):
-    """Extend PTB HTTPX client to allow toggling SSL verification."""
+    """Run PTB requests over the process-wide pooled HTTPX client."""
 
     def __init__(self, *args, verify: bool = True, **kwargs):
         self._verify_override = verify
         super().__init__(*args, **kwargs)
 
     def _build_client(self) -> httpx.AsyncClient:  # type: ignore[override]
+        # PTB builds its client at construction time, before any loop runs;
+        # that placeholder is swapped for the shared client in initialize()
         client_kwargs = {**self._client_kwargs, "verify": self._verify_override}
         return httpx.AsyncClient(**client_kwargs)
 
+    async def initialize(self) -> None:
+        placeholder = self._client
+        self._client = get_shared_httpx()
+        if placeholder is not self._client and not placeholder.is_closed:
+            await placeholder.aclose()
+
+    async def shutdown(self) -> None:
+        # The shared client is owned (and closed) by the FastAPI lifespan
+        return
+
 
 # Initialize Telegram application (TLS verify disabled for local proxy)
 telegram_request = CustomHTTPXRequest(verify=False)
@@ -113,46 +130,210 @@ Our agents will:
 Ready to start? Type your symptoms! 🏥
 """.strip()
 
-def _model_dump(model):
-    return model.model_dump(by_alias=True, exclude_none=True)
+# Static command responses, built once at import
+HELP_TEXT = """
+❓ **SwasthAI Help**
+
+**🤖 Multi-Agent System:**
+Our 4 specialized AI agents work together:
+
+1️⃣ **Coordinator Agent**
+   • Routes your queries
+   • Manages workflow
+   • Schedules follow-ups
+
+2️⃣ **Triage Agent**
+   • Symptom assessment
+   • Risk stratification
+   • Health recommendations
+
+3️⃣ **Surveillance Agent**
+   • Pattern detection
+   • Outbreak identification
+   • Community monitoring
+
+4️⃣ **Alert Agent**
+   • Health notifications
+   • Community alerts
+   • Emergency warnings
+
+**📝 Symptom Reporting:**
+Just type naturally:
+• "Fever and cough for 2 days"
+• "Headache and nausea"
+• "Difficulty breathing"
+
+**🎯 Risk Levels:**
+🚨 CRITICAL - Emergency care needed
+⚠️ HIGH - See doctor soon
+🟡 MODERATE - Monitor closely
+✅ LOW - Self-care
+
+**Commands:**
+/start - Start conversation
+/help - This message
+/status - Health history
+/test - Test agents
+
+**🚨 Emergency:**
+Severe symptoms? Call: 108 / 112
+
+**🔐 Privacy:**
+Your data is secure and used only for:
+• Your personal health monitoring
+• Anonymous community surveillance
+• Early disease detection
+
+Questions? Just ask! 💬
+""".strip()
+
+TEST_MSG_TEMPLATE = """
+🧪 **SwasthAI System Test**
+
+**Bot Status:** ✅ Operational
+**AI Agents:** ✅ All Active
+**Database:** ✅ Connected
+**Surveillance:** ✅ Monitoring
+
+**Your Account:**
+• ID: {user_id}
+• Username: @{username}
+• Name: {first_name}
+
+**Active Agents:**
+🤖 Coordinator: Ready
+🏥 Triage: Ready
+📊 Surveillance: Running
+📢 Alert: Standby
+
+**Test AI Assessment:**
+Type: "I have fever and headache"
+
+The agents will coordinate to provide comprehensive assessment! 🚀
+""".strip()
+
+STATUS_EMPTY_TEMPLATE = """
+📊 **Health Status - {user_name}**
+
+No symptoms reported yet.
+
+Type your symptoms to start AI-powered health monitoring! 🏥
+""".strip()
+
+STATUS_TEMPLATE = """
+📊 **Your Health Status**
+
+**Latest Assessment:** {hours_ago}h ago
+{risk_emoji} **Risk:** {risk_level}
+**Severity:** {severity_score}/10
+
+**Symptoms:** {symptoms}
+
+**Assessment:**
+{assessment}...
+
+**History:** {report_count} reports
+""".strip()
+
+RISK_EMOJI = {
+    "critical": "🚨",
+    "high": "⚠️",
+    "moderate": "🟡",
+    "low": "✅"
+}
+
+
+# Translated welcome text per language; the source text never changes
+_WELCOME_CACHE = {"en": WELCOME_MESSAGE_EN}
+
+
+def welcome_message(language_code: str) -> str:
+    """Return the welcome message in the given language, translating once"""
+    cached = _WELCOME_CACHE.get(language_code)
+    if cached is None:
+        translated = translate_text_sync(WELCOME_MESSAGE_EN, language_code)
+        if not translated or translated == WELCOME_MESSAGE_EN:
+            # Translation failed; don't pin the English text for this language
+            return WELCOME_MESSAGE_EN
+        cached = _WELCOME_CACHE[language_code] = translated
+    return cached
+
+
+def prime_welcome_cache():
+    """Translate the welcome message for every supported language up front"""
+    for language_code in LANGUAGE_OPTIONS:
+        welcome_message(language_code)
+
+
+# Conversation turns kept per user and passed to the crew
+HISTORY_LIMIT = 10
+
+
+def _conversation_history(context: ContextTypes.DEFAULT_TYPE) -> deque:
+    """Return the user's bounded conversation history (last HISTORY_LIMIT turns)"""
+    history = context.user_data.get("history")
+    if not isinstance(history, deque):
+        history = deque(history or (), maxlen=HISTORY_LIMIT)
+        context.user_data["history"] = history
+    return history
+
+
+# Only the profile fields the handlers read
+_USER_PROJECTION = {
+    "preferred_language": 1,
+    "username": 1,
+    "first_name": 1,
+    "last_name": 1,
+}
+
+# Only the fields /status renders
+_STATUS_RECORD_PROJECTION = {
+    "risk_level": 1,
+    "severity_score": 1,
+    "symptoms": 1,
+    "agent_assessment": 1,
+    "reported_at": 1,
+    "requires_followup": 1,
+    "_id": 0,
+}
 
 
 async def fetch_user(telegram_id: str):
-    return await users_collection.find_one({"telegram_id": telegram_id})
+    return await users_collection.find_one(
+        {"telegram_id": telegram_id}, _USER_PROJECTION
+    )
 
 
-async def ensure_user_profile(tg_user):
+async def ensure_user_profile(tg_user, now: Optional[datetime] = None):
+    """Upsert the user's Telegram profile and return (profile, created) in one round trip"""
     telegram_id = str(tg_user.id)
-    existing = await fetch_user(telegram_id)
-    now = datetime.utcnow()
-    update_fields = {
-        "username": tg_user.username,
-        "first_name": tg_user.first_name,
-        "last_name": tg_user.last_name,
-        "updated_at": now,
-    }
-    
-    if existing:
-        # backfill default language if missing
-        if "preferred_language" not in existing:
-            update_fields["preferred_language"] = "en"
-        if update_fields:
-            await users_collection.update_one(
-                {"telegram_id": telegram_id},
-                {"$set": update_fields},
-            )
-        return await fetch_user(telegram_id), False
+    now = now or datetime.now(timezone.utc)
+    # Mongo stores milliseconds; truncate so created_at compares equal on the way back
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
     
-    user_model = User(
-        telegram_id=telegram_id,
-        username=tg_user.username,
-        first_name=tg_user.first_name,
-        last_name=tg_user.last_name,
+    profile = await users_collection.find_one_and_update(
+        {"telegram_id": telegram_id},
+        [
+            {
+                "$set": {
+                    # $literal so names starting with "$" aren't read as field paths
+                    "username": {"$literal": tg_user.username},
+                    "first_name": {"$literal": tg_user.first_name},
+                    "last_name": {"$literal": tg_user.last_name},
+                    "updated_at": now,
+                    # backfill defaults for new users and bare session-created ones
+                    "preferred_language": {"$ifNull": ["$preferred_language", "en"]},
+                    "created_at": {"$ifNull": ["$created_at", now]},
+                }
+            }
+        ],
+        projection={**_USER_PROJECTION, "created_at": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
     )
-    payload = _model_dump(user_model)
-    result = await users_collection.insert_one(payload)
-    payload["_id"] = result.inserted_id
-    return payload, True
+    # Motor hands back naive UTC datetimes
+    created = profile.pop("created_at", None) == now.replace(tzinfo=None)
+    return profile, created
 
 
 async def fetch_active_session(telegram_id: str):
@@ -165,53 +346,46 @@ async def fetch_active_session(telegram_id: str):
     )
 
 
-async def ensure_active_session(telegram_id: str) -> Session:
-    """Ensure user has an active session"""
+async def ensure_active_session(telegram_id: str, user_id, now: Optional[datetime] = None) -> Session:
+    """Ensure user has an active session
     
-    # Get or create user (ASYNC)
-    user = await users_collection.find_one({"telegram_id": telegram_id})
+    Args:
+        telegram_id: User's Telegram ID
+        user_id: The user's `_id`, as returned by ensure_user_profile (which
+            owns the user upsert, so the users document is written once)
+        now: Timestamp to stamp a newly created session with
+    """
     
-    if not user:
-        # Create new user
-        user_data = {
-            "telegram_id": telegram_id,
-            "created_at": datetime.utcnow(),
-            "updated_at": datetime.utcnow()
-        }
-        result = await users_collection.insert_one(user_data)
-        user = await users_collection.find_one({"_id": result.inserted_id})
+    now = now or datetime.now(timezone.utc)
     
-    # Find active session (ASYNC)
-    session = await sessions_collection.find_one(
+    # Get or create the active session in one round trip
+    session = await sessions_collection.find_one_and_update(
         {
-            "user_id": user["_id"],
+            "user_id": user_id,
             "session_state": {"$ne": "COMPLETED"}
         },
-        sort=[("started_at", -1)]
+        {
+            "$setOnInsert": {
+                "telegram_id": telegram_id,
+                "session_state": "initial",
+                "context": {},
+                "current_question": 0,
+                "symptoms_collected": [],
+                "started_at": now,
+                "last_activity": now
+            }
+        },
+        sort=[("started_at", -1)],
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
     )
     
-    if not session:
-        # Create new session
-        session_data = {
-            "user_id": user["_id"],
-            "telegram_id": telegram_id,
-            "session_state": "initial",
-            "context": {},
-            "current_question": 0,
-            "symptoms_collected": [],
-            "started_at": datetime.utcnow(),
-            "last_activity": datetime.utcnow()
-        }
-        result = await sessions_collection.insert_one(session_data)
-        session = await sessions_collection.find_one({"_id": result.inserted_id})
-    
-    # Convert ObjectId to string for Pydantic
+    # Convert ObjectIds to strings for Pydantic
     session_dict = dict(session)
-    session_dict["_id"] = str(session_dict["_id"])  # Convert ObjectId to string
-    session_dict["user_id"] = str(session_dict["user_id"])  # Convert user_id too
+    session_dict["user_id"] = str(session_dict["user_id"])
     
-    # Convert to Pydantic model
-    return Session(**session_dict)
+    # Trusted document we just wrote: hydrate without re-validating
+    return Session.from_mongo(session_dict)
 
 
 # Command handlers
@@ -243,118 +417,51 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /help command"""
-    help_text = """
-❓ **SwasthAI Help**
-
-**🤖 Multi-Agent System:**
-Our 4 specialized AI agents work together:
-
-1️⃣ **Coordinator Agent**
-   • Routes your queries
-   • Manages workflow
-   • Schedules follow-ups
-
-2️⃣ **Triage Agent**
-   • Symptom assessment
-   • Risk stratification
-   • Health recommendations
-
-3️⃣ **Surveillance Agent**
-   • Pattern detection
-   • Outbreak identification
-   • Community monitoring
-
-4️⃣ **Alert Agent**
-   • Health notifications
-   • Community alerts
-   • Emergency warnings
-
-**📝 Symptom Reporting:**
-Just type naturally:
-• "Fever and cough for 2 days"
-• "Headache and nausea"
-• "Difficulty breathing"
-
-**🎯 Risk Levels:**
-🚨 CRITICAL - Emergency care needed
-⚠️ HIGH - See doctor soon
-🟡 MODERATE - Monitor closely
-✅ LOW - Self-care
-
-**Commands:**
-/start - Start conversation
-/help - This message
-/status - Health history
-/test - Test agents
-
-**🚨 Emergency:**
-Severe symptoms? Call: 108 / 112
-
-**🔐 Privacy:**
-Your data is secure and used only for:
-• Your personal health monitoring
-• Anonymous community surveillance
-• Early disease detection
-
-Questions? Just ask! 💬
-"""
-    await update.message.reply_text(help_text)
+    await update.message.reply_text(HELP_TEXT)
 
 async def status_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /status command"""
     telegram_id = str(update.effective_user.id)
     user_name = update.effective_user.first_name
     
-    user = await fetch_user(telegram_id)
+    user = await users_collection.find_one({"telegram_id": telegram_id}, {"_id": 1})
     if not user:
         await update.message.reply_text("No health records found. Use /start to begin.")
         return
     
     cursor = (
-        health_records_collection.find({"telegram_id": telegram_id})
+        health_records_collection.find(
+            {"telegram_id": telegram_id}, _STATUS_RECORD_PROJECTION
+        )
         .sort("reported_at", DESCENDING)
         .limit(5)
     )
     records = await cursor.to_list(length=5)
     
     if not records:
-        status_text = f"""
-📊 **Health Status - {user_name}**
-
-No symptoms reported yet.
-
-Type your symptoms to start AI-powered health monitoring! 🏥
-"""
+        status_text = STATUS_EMPTY_TEMPLATE.format(user_name=user_name)
     else:
         latest = records[0]
-        reported_at = latest.get("reported_at", datetime.utcnow())
-        time_ago = datetime.utcnow() - reported_at
+        now = datetime.now(timezone.utc)
+        reported_at = latest.get("reported_at") or now
+        if reported_at.tzinfo is None:
+            reported_at = reported_at.replace(tzinfo=timezone.utc)
+        time_ago = now - reported_at
         hours_ago = int(time_ago.total_seconds() / 3600)
-        
-        risk_emoji = {
-            "critical": "🚨",
-            "high": "⚠️",
-            "moderate": "🟡",
-            "low": "✅"
-        }
-        
-        status_text = f"""
-📊 **Your Health Status**
-
-**Latest Assessment:** {hours_ago}h ago
-{risk_emoji.get(latest.get('risk_level'), '🟡')} **Risk:** {latest.get('risk_level', 'moderate').upper()}
-**Severity:** {latest.get('severity_score', 0)}/10
-
-**Symptoms:** {', '.join(latest.get('symptoms', []))}
-
-**Assessment:**
-{(latest.get('agent_assessment') or '')[:200]}...
-
-**History:** {len(records)} reports
-"""
+        risk_level = latest.get("risk_level") or "moderate"
+        
+        status_text = STATUS_TEMPLATE.format(
+            hours_ago=hours_ago,
+            risk_emoji=RISK_EMOJI.get(risk_level.lower(), "🟡"),
+            risk_level=risk_level.upper(),
+            severity_score=latest.get("severity_score", 0),
+            symptoms=", ".join(latest.get("symptoms", [])),
+            assessment=(latest.get("agent_assessment") or "")[:200],
+            report_count=len(records),
+        )
         
         if latest.get("requires_followup"):
-            status_text += f"\n📅 **Follow-up:** Scheduled"
+            status_text += "\n📅 **Follow-up:** Scheduled"
         
         status_text += "\n\n Type new symptoms to update your status."
     
@@ -364,30 +471,11 @@ async def test_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /test command"""
     user = update.effective_user
     
-    test_msg = f"""
-🧪 **SwasthAI System Test**
-
-**Bot Status:** ✅ Operational
-**AI Agents:** ✅ All Active
-**Database:** ✅ Connected
-**Surveillance:** ✅ Monitoring
-
-**Your Account:**
-• ID: {user.id}
-• Username: @{user.username or 'Not set'}
-• Name: {user.first_name}
-
-**Active Agents:**
-🤖 Coordinator: Ready
-🏥 Triage: Ready
-📊 Surveillance: Running
-📢 Alert: Standby
-
-**Test AI Assessment:**
-Type: "I have fever and headache"
-
-The agents will coordinate to provide comprehensive assessment! 🚀
-"""
+    test_msg = TEST_MSG_TEMPLATE.format(
+        user_id=user.id,
+        username=user.username or "Not set",
+        first_name=user.first_name,
+    )
     await update.message.reply_text(test_msg)
 
 async def language_selection_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -414,44 +502,92 @@ async def language_selection_handler(update: Update, context: ContextTypes.DEFAU
     ack_text = LANGUAGE_OPTIONS[language_code]["ack"]
     await query.edit_message_text(ack_text)
     
-    welcome_text = WELCOME_MESSAGE_EN
-    if language_code != "en":
-        # ✅ FIX 2: REMOVE AWAIT HERE (translate_text_sync is NOT async)
-        translated = translate_text_sync(WELCOME_MESSAGE_EN, language_code)
-        if translated:
-            welcome_text = translated
+    welcome_text = (
+        _WELCOME_CACHE.get(language_code)
+        or await asyncio.to_thread(welcome_message, language_code)
+    )
     
     await query.message.reply_text(welcome_text)
 
 
+# Telegram clients split long pastes at 4096 chars into several updates that
+# arrive within milliseconds; buffer text per chat and dispatch it once.
+_COALESCE_DELAY = 0.3
+_COALESCE_DELAY_AFTER_SPLIT = 1.0
+_TELEGRAM_SPLIT_THRESHOLD = 4000
+
+# chat_id -> {"parts": [str, ...], "task": asyncio.Task}
+_pending_text = {}
+
+
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Buffer text messages briefly so split pastes reach the agents as one"""
+    chat_id = update.effective_chat.id
+    text = update.message.text or ""
+    
+    pending = _pending_text.setdefault(chat_id, {"parts": [], "task": None})
+    pending["parts"].append(text)
+    if pending["task"] is not None:
+        pending["task"].cancel()
+    
+    # A chunk near the split point likely has a continuation on its way
+    delay = (
+        _COALESCE_DELAY_AFTER_SPLIT
+        if len(text) >= _TELEGRAM_SPLIT_THRESHOLD
+        else _COALESCE_DELAY
+    )
+    task = asyncio.create_task(_flush_text_after(chat_id, delay, update, context))
+    pending["task"] = task
+    _update_tasks.add(task)
+    task.add_done_callback(_on_update_done)
+
+
+async def _flush_text_after(chat_id, delay: float, update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Dispatch the buffered text for a chat once no new chunk arrived within `delay`"""
+    await asyncio.sleep(delay)
+    # Popped right after the sleep, so a newer chunk can only cancel us while waiting
+    pending = _pending_text.pop(chat_id, None)
+    if pending:
+        await _process_text_message(update, context, _join_text_parts(pending["parts"]))
+
+
+def _join_text_parts(parts: list) -> str:
+    """Glue split continuations back together; keep separate messages on separate lines"""
+    text = parts[0]
+    for previous, part in zip(parts, parts[1:]):
+        text += ("" if len(previous) >= _TELEGRAM_SPLIT_THRESHOLD else "\n") + part
+    return text
+
+
+async def _process_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE, message_text: str):
     """Handle text messages with CrewAI multi-agent system"""
     user = update.effective_user
     telegram_id = str(update.effective_user.id)
-    profile, _ = await ensure_user_profile(user)
-    preferred_language = profile.get("preferred_language", "en")
-    message_text = update.message.text
     
     log.info(f"💬 Message from {telegram_id}: {message_text}")
     
     try:
-        # Send typing indicator
-        await update.message.chat.send_action("typing")
-        await ensure_user_profile(user)
+        # Typing indicator overlaps the profile upsert; the session needs the user's _id
+        now = datetime.now(timezone.utc)
+        _, (profile, _) = await asyncio.gather(
+            update.message.chat.send_action("typing"),
+            ensure_user_profile(user, now=now),
+        )
+        session = await ensure_active_session(telegram_id, profile["_id"], now=now)
+        preferred_language = profile.get("preferred_language", "en")
         
         # Normalize user input
         if preferred_language != "en" and message_text:
             try:
-                normalized = translate_text_sync(message_text, preferred_language)
+                normalized = await asyncio.to_thread(
+                    translate_text_sync, message_text, preferred_language
+                )
                 if normalized and normalized != message_text:
                     log.info(f"🔤 Normalized: '{message_text}' → '{normalized}'")
                     message_text = normalized
             except Exception as t_e:
                 log.warning(f"Translation normalization failed: {t_e}")
         
-        # Get or create user session
-        session = await ensure_active_session(telegram_id)
-        
         session_data = {
             "session_id": session.id,
             "state": session.session_state,
@@ -461,8 +597,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
         }
         
         # Get conversation history
-        if 'history' not in context.user_data:
-            context.user_data['history'] = []
+        history = _conversation_history(context)
         
         # Get health crew and process message
         log.info(f"🚀 Invoking CrewAI agents for {telegram_id}")
@@ -473,14 +608,12 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             message=message_text,
             telegram_id=telegram_id,
             session_data=session_data,
-            conversation_history=context.user_data.get('history', []),
+            conversation_history=list(history),
             language=preferred_language
         )
         
         # Store in history
-        context.user_data['history'].append(f"User: {message_text}")
-        if len(context.user_data['history']) > 10:
-            context.user_data['history'] = context.user_data['history'][-10:]
+        history.append(f"User: {message_text}")
         
         log.info(f"✅ CrewAI processing complete for {telegram_id}")
         
@@ -498,13 +631,18 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     "Sorry, I encountered an error. Please try again or use /help."
                 )
         
-        elif result and result.get("status") == "success" and result.get("result"):
+        elif (
+            result and result.get("status") == "success"
+            and result.get("result") and not result.get("reply_sent")
+        ):
             reply_text = result.get("result")
             
             # Translate outgoing response to user's language
             if preferred_language != "en" and reply_text:
                 try:
-                    translated_reply = translate_text_sync(reply_text, preferred_language)
+                    translated_reply = await asyncio.to_thread(
+                        translate_text_sync, reply_text, preferred_language
+                    )
                     if translated_reply and translated_reply != reply_text:
                         reply_text = translated_reply
                         log.info(f"🔁 Translated reply to {preferred_language}")
@@ -515,9 +653,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text(reply_text)
         
     except Exception as e:
-        log.error(f"❌ Error handling message: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"❌ Error handling message: {str(e)}")
         
         await update.message.reply_text(
             "Sorry, I encountered an error processing your message. "
@@ -527,30 +663,42 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 
+async def _stream_download(file_url: str, chunk_size: int = 65536) -> BytesIO:
+    """Stream a Telegram file into memory in chunks over the shared HTTPX pool"""
+    buffer = BytesIO()
+    async with get_shared_httpx().stream("GET", file_url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(chunk_size):
+            buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
 # Add this new handler for photos BEFORE the message handler
 async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle photo messages with medical image analysis"""
     user = update.effective_user
     telegram_id = str(user.id)
     
-    profile, _ = await ensure_user_profile(user)
-    preferred_language = profile.get("preferred_language", "en")
-    
     log.info(f"📷 Photo received from {telegram_id}")
     
+    tmp_path = None
     try:
-        # Send typing indicator
-        await update.message.chat.send_action("typing")
+        # Typing indicator and profile lookup are independent; overlap them
+        _, (profile, _) = await asyncio.gather(
+            update.message.chat.send_action("typing"),
+            ensure_user_profile(user),
+        )
+        preferred_language = profile.get("preferred_language", "en")
         
         # Get the photo file
         photo = update.message.photo[-1]  # Get highest resolution
         file = await context.bot.get_file(photo.file_id)
         
-        # Download to temporary file
+        # analyze_medical_image takes a file path, so the photo goes to a temp file
         with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp_file:
             tmp_path = tmp_file.name
         
-        # Download file to disk
         await file.download_to_drive(tmp_path)
         
         log.info(f"🖼️ Downloaded image to: {tmp_path}")
@@ -564,8 +712,9 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         # Translate if needed
         if preferred_language != "en" and analysis:
             try:
-                from utils.translation import translate_text_sync
-                translated = await translate_text_sync(analysis, preferred_language)
+                translated = await asyncio.to_thread(
+                    translate_text_sync, analysis, preferred_language
+                )
                 if translated:
                     analysis = translated
                     log.info(f"✅ Translated analysis to {preferred_language}")
@@ -581,54 +730,54 @@ async def handle_photo(update: Update, context: ContextTypes.DEFAULT_TYPE):
         log.info(f"✅ Image analysis sent to {telegram_id}")
         
     except Exception as e:
-        log.error(f"❌ Error handling photo: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"❌ Error handling photo: {type(e).__name__}: {str(e)}")
         await update.message.reply_text(
             "Sorry, I couldn't analyze the image. Please try again or describe your symptoms."
         )
+    
+    finally:
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError as e:
+                log.warning(f"Could not delete temp image {tmp_path}: {e}")
 
 async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle voice messages with speech-to-text and health response"""
     user = update.effective_user
     telegram_id = str(user.id)
     
-    profile, _ = await ensure_user_profile(user)
-    preferred_language = profile.get("preferred_language", "en")
-    
     log.info(f"🎤 Voice message received from {telegram_id}")
     
-    ogg_path = None
     try:
-        # Send typing indicator
-        await update.message.chat.send_action("typing")
+        # Typing indicator overlaps the profile upsert; the session needs the user's _id
+        now = datetime.now(timezone.utc)
+        _, (profile, _) = await asyncio.gather(
+            update.message.chat.send_action("typing"),
+            ensure_user_profile(user, now=now),
+        )
+        session = await ensure_active_session(telegram_id, profile["_id"], now=now)
+        preferred_language = profile.get("preferred_language", "en")
         
         # Get the voice file
         voice_file = update.message.voice
         file = await context.bot.get_file(voice_file.file_id)
         
-        # Create unique temporary file path to avoid caching
-        unique_id = str(uuid.uuid4())[:8]
-        temp_dir = tempfile.gettempdir()
-        ogg_path = os.path.join(temp_dir, f"voice_{telegram_id}_{unique_id}.ogg")
-        
-        log.info(f"🎤 Downloading voice to: {ogg_path}")
-        
-        # Save voice file
-        await file.download_to_drive(ogg_path)
+        # Stream into memory over the pooled client; no temp file to clean up
+        ogg_buffer = await _stream_download(file.file_path)
         
-        if not os.path.exists(ogg_path):
-            log.error(f"❌ Voice file download failed: {ogg_path}")
+        if not ogg_buffer.getbuffer().nbytes:
+            log.error(f"❌ Voice file download failed for {telegram_id}")
             await update.message.reply_text(
                 "Sorry, I couldn't download the voice file. Please try again."
             )
             return
         
-        log.info(f"✅ Voice file downloaded ({os.path.getsize(ogg_path)} bytes)")
+        log.info(f"✅ Voice file downloaded ({ogg_buffer.getbuffer().nbytes} bytes)")
         log.info(f"🎤 Transcribing voice from {telegram_id}...")
         
         # Transcribe audio
-        transcription = await transcribe_audio(ogg_path)
+        transcription = await transcribe_audio_bytes(ogg_buffer.getvalue())
         
         if not transcription or "failed" in transcription.lower() or "error" in transcription.lower():
             await update.message.reply_text(
@@ -642,9 +791,6 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(f"🎤 Transcribed: {transcription}")
         
         # Now process the transcribed text like a normal message
-        # Ensure active session
-        session = await ensure_active_session(telegram_id)
-        
         session_data = {
             "session_id": session.id,
             "state": session.session_state,
@@ -653,8 +799,7 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "symptoms_collected": session.symptoms_collected
         }
         
-        if "history" not in context.user_data:
-            context.user_data["history"] = []
+        history = _conversation_history(context)
         
         # Get health crew and process transcribed message
         health_crew = get_health_crew()
@@ -665,13 +810,11 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             message=transcription,
             telegram_id=telegram_id,
             session_data=session_data,
-            conversation_history=context.user_data.get("history", []),
+            conversation_history=list(history),
             language=preferred_language,
         )
         
-        context.user_data["history"].append(f"User (voice): {transcription}")
-        if len(context.user_data["history"]) > 10:
-            context.user_data["history"] = context.user_data["history"][-10:]
+        history.append(f"User (voice): {transcription}")
         
         log.info(f"✅ Voice health assessment complete for {telegram_id}")
         
@@ -682,8 +825,9 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Final translation
             if preferred_language != "en" and reply_text:
                 try:
-                    # ✅ NO AWAIT - translate_text_sync is synchronous
-                    translated_reply = translate_text_sync(reply_text, preferred_language)
+                    translated_reply = await asyncio.to_thread(
+                        translate_text_sync, reply_text, preferred_language
+                    )
                     if translated_reply:
                         reply_text = translated_reply
                         log.info(f"✅ Translated reply to {preferred_language}")
@@ -699,20 +843,10 @@ async def handle_voice(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
         
     except Exception as e:
-        log.error(f"❌ Error handling voice: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"❌ Error handling voice: {type(e).__name__}: {str(e)}")
         await update.message.reply_text(
             "Sorry, I couldn't process the voice message. Please try again."
         )
-    finally:
-        # Clean up OGG file
-        if ogg_path and os.path.exists(ogg_path):
-            try:
-                os.remove(ogg_path)
-                log.debug(f"🗑️ Cleaned up voice file: {ogg_path}")
-            except Exception as cleanup_err:
-                log.warning(f"Could not delete voice file: {cleanup_err}")
 
 
 # Register handlers
@@ -725,25 +859,65 @@ telegram_app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_
 telegram_app.add_handler(MessageHandler(filters.PHOTO, handle_photo))
 telegram_app.add_handler(MessageHandler(filters.VOICE, handle_voice))
 
+# Strong references to in-flight update tasks so they aren't garbage collected
+_update_tasks = set()
+
+# Telegram redelivers updates it thinks timed out; remember recent update_ids
+_seen_update_ids = TTLCache(maxsize=10000, ttl=300)
+
+
+def _on_update_done(task: asyncio.Task):
+    """Drop the finished task and log any failure it raised"""
+    _update_tasks.discard(task)
+    if task.cancelled():
+        return
+    error = task.exception()
+    if error is not None:
+        log.error(f"❌ Update processing failed: {type(error).__name__}: {error}")
+
+
 @telegram_router.post("/telegram")
-async def telegram_webhook(request: Request):
-    """Telegram webhook endpoint"""
+async def telegram_webhook(
+    request: Request,
+    x_telegram_bot_api_secret_token: Optional[str] = Header(default=None),
+):
+    """Telegram webhook endpoint
+    
+    Acks immediately and processes the update in a background task, so
+    Telegram never waits on the agent pipeline.
+    """
+    # Reject forged posts before reading or parsing the body
+    if settings.TELEGRAM_WEBHOOK_SECRET and not hmac.compare_digest(
+        (x_telegram_bot_api_secret_token or "").encode(),
+        settings.TELEGRAM_WEBHOOK_SECRET.encode(),
+    ):
+        log.warning("🚫 Webhook rejected: bad secret token")
+        raise HTTPException(status_code=401, detail="Invalid secret token")
+    
     try:
-        data = await request.json()
+        data = orjson.loads(await request.body())
         log.info(f"📥 Webhook received")
         
+        # Skip redelivered updates before doing any work; without an id there's nothing to match on
+        update_id = data.get("update_id")
+        if update_id is not None:
+            if update_id in _seen_update_ids:
+                log.info(f"⏭️ Duplicate update {update_id} ignored")
+                return {"status": "ok"}
+            _seen_update_ids[update_id] = True
+        
         # Create Update object
         update = Update.de_json(data, telegram_app.bot)
         
-        # Process update
-        await telegram_app.process_update(update)
+        # Process update in the background
+        task = asyncio.create_task(telegram_app.process_update(update))
+        _update_tasks.add(task)
+        task.add_done_callback(_on_update_done)
         
         return {"status": "ok"}
         
     except Exception as e:
-        log.error(f"❌ Webhook error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"❌ Webhook error: {str(e)}")
         return {"status": "error", "message": str(e)}
 
 @telegram_router.get("/setup")
@@ -759,7 +933,13 @@ async def setup_webhook():
         webhook_url = f"{settings.WEBHOOK_URL}/webhook/telegram"
         
         # Set webhook
-        await telegram_app.bot.set_webhook(webhook_url)
+        # Only subscribe to the update types the handlers consume
+        await telegram_app.bot.set_webhook(
+            webhook_url,
+            allowed_updates=["message", "callback_query"],
+            secret_token=settings.TELEGRAM_WEBHOOK_SECRET or None,
+            max_connections=100,
+        )
         
         # Get webhook info
         webhook_info = await telegram_app.bot.get_webhook_info()
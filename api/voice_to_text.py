@@ -1,8 +1,18 @@
 # api/voice_to_text.py
+import asyncio
+import functools
+import hashlib
+import multiprocessing
 import os
+import subprocess
 import tempfile
-import uuid
+import threading
+import time
+from io import BytesIO
 from pathlib import Path
+from typing import BinaryIO, List, Union
+from concurrent.futures import ProcessPoolExecutor
+from cachetools import LRUCache
 from utils import log
 from config import settings
 
@@ -14,22 +24,18 @@ FFPROBE_PATH = TOOLS_DIR / "ffprobe.exe"
 # Check if both files exist
 ffmpeg_exists = FFMPEG_PATH.exists()
 ffprobe_exists = FFPROBE_PATH.exists()
+_FFMPEG_READY = ffmpeg_exists and ffprobe_exists
 
-if ffmpeg_exists and ffprobe_exists:
-    # Configure pydub to use bundled binaries
-    from pydub import AudioSegment
-    AudioSegment.converter = str(FFMPEG_PATH)
-    AudioSegment.ffmpeg = str(FFMPEG_PATH)
-    AudioSegment.ffprobe = str(FFPROBE_PATH)
-    
+if _FFMPEG_READY:
     log.info(f"✅ Using bundled ffmpeg: {FFMPEG_PATH}")
     log.info(f"✅ Using bundled ffprobe: {FFPROBE_PATH}")
     
-    # Verify file sizes (should be ~120-130 MB each)
-    ffmpeg_size = FFMPEG_PATH.stat().st_size / (1024 * 1024)
-    ffprobe_size = FFPROBE_PATH.stat().st_size / (1024 * 1024)
-    log.info(f"📊 ffmpeg.exe: {ffmpeg_size:.1f} MB")
-    log.info(f"📊 ffprobe.exe: {ffprobe_size:.1f} MB")
+    if settings.DEBUG:
+        # Verify file sizes (should be ~120-130 MB each)
+        ffmpeg_size = FFMPEG_PATH.stat().st_size / (1024 * 1024)
+        ffprobe_size = FFPROBE_PATH.stat().st_size / (1024 * 1024)
+        log.debug(f"📊 ffmpeg.exe: {ffmpeg_size:.1f} MB")
+        log.debug(f"📊 ffprobe.exe: {ffprobe_size:.1f} MB")
     
 else:
     # Log what's missing
@@ -43,130 +49,377 @@ else:
     log.error("   Extract bin/ffmpeg.exe and bin/ffprobe.exe to tools/ folder")
 
 
-async def transcribe_audio(audio_path: str) -> str:
+# Raw PCM format handed to SpeechRecognition: mono, 16 kHz, signed 16-bit
+SAMPLE_RATE = 16000
+SAMPLE_WIDTH = 2
+
+
+# Caps concurrent Google Speech API calls across all voice messages
+GOOGLE_STT_CONCURRENCY = 5
+_google_stt_semaphore = asyncio.Semaphore(GOOGLE_STT_CONCURRENCY)
+
+
+def _release_google_stt_slot(future: asyncio.Future):
+    """Free a Google STT slot once its worker thread has really finished"""
+    _google_stt_semaphore.release()
+    if not future.cancelled():
+        future.exception()  # mark retrieved if the caller stopped waiting
+
+
+async def _recognize_google(recognizer, audio_data, language: str) -> str:
+    """Run one blocking recognize_google call in a worker thread
+    
+    The slot is held until the thread returns, even if the caller is
+    cancelled: the HTTP request can't be interrupted, so it still counts.
+    """
+    await _google_stt_semaphore.acquire()
+    try:
+        future = asyncio.ensure_future(
+            asyncio.to_thread(recognizer.recognize_google, audio_data, language=language)
+        )
+    except BaseException:
+        _google_stt_semaphore.release()
+        raise
+    future.add_done_callback(_release_google_stt_slot)
+    return await asyncio.shield(future)
+
+
+# Google Cloud Speech-to-Text streaming (opt-in via settings.GOOGLE_CLOUD_STT).
+# Telegram voice notes are 48kHz OGG/Opus, which the API decodes natively.
+CLOUD_STT_SAMPLE_RATE = 48000
+CLOUD_STT_CHUNK_BYTES = 25600  # per-request audio limit for streaming recognize
+_cloud_speech_client = None
+
+
+async def _recognize_cloud_streaming(ogg_bytes: bytes) -> str:
+    """Recognize raw OGG/Opus with one Hindi+English streaming_recognize call"""
+    global _cloud_speech_client
+    # alternative_language_codes lives in the v1p1beta1 surface
+    from google.cloud import speech_v1p1beta1 as speech
+    
+    if _cloud_speech_client is None:
+        _cloud_speech_client = speech.SpeechAsyncClient()
+    
+    streaming_config = speech.StreamingRecognitionConfig(
+        config=speech.RecognitionConfig(
+            encoding=speech.RecognitionConfig.AudioEncoding.OGG_OPUS,
+            sample_rate_hertz=CLOUD_STT_SAMPLE_RATE,
+            language_code="hi-IN",
+            alternative_language_codes=["en-US"],
+        )
+    )
+    
+    async def requests():
+        yield speech.StreamingRecognizeRequest(streaming_config=streaming_config)
+        for start in range(0, len(ogg_bytes), CLOUD_STT_CHUNK_BYTES):
+            yield speech.StreamingRecognizeRequest(
+                audio_content=ogg_bytes[start:start + CLOUD_STT_CHUNK_BYTES]
+            )
+    
+    stream = await _cloud_speech_client.streaming_recognize(requests=requests())
+    parts = []
+    async for response in stream:
+        for result in response.results:
+            if result.is_final and result.alternatives:
+                parts.append(result.alternatives[0].transcript)
+    return " ".join(parts).strip()
+
+
+# Decoding runs in worker processes so the pydub fallback's Python-side PCM work
+# doesn't serialize behind the GIL. Workers mostly wait on ffmpeg, so a few suffice.
+VOICE_DECODE_WORKERS = min(4, os.cpu_count() or 1)
+
+# Never fork: the server already runs threads (uvicorn, the default executor,
+# loguru's enqueue writer) and forking a threaded process can deadlock.
+# forkserver/spawn workers start clean and re-import this module.
+_VOICE_POOL_CONTEXT = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+
+_voice_pool = None
+_voice_pool_lock = threading.Lock()
+
+
+def _get_voice_pool() -> ProcessPoolExecutor:
+    """Return the shared decode process pool, creating it on first use"""
+    global _voice_pool
+    with _voice_pool_lock:
+        if _voice_pool is None:
+            _voice_pool = ProcessPoolExecutor(
+                max_workers=VOICE_DECODE_WORKERS,
+                mp_context=_VOICE_POOL_CONTEXT,
+            )
+        return _voice_pool
+
+
+def shutdown_voice_pool():
+    """Stop the decode worker processes (called on app shutdown)"""
+    global _voice_pool
+    with _voice_pool_lock:
+        if _voice_pool is not None:
+            _voice_pool.shutdown(wait=False, cancel_futures=True)
+            _voice_pool = None
+
+
+# BLAKE2b(audio bytes) -> transcript; only successful recognitions are stored
+_transcript_cache = LRUCache(maxsize=512)
+
+# Bounds concurrent ffmpeg + recognition pipelines so bursts queue instead of forking
+_transcribe_semaphore = asyncio.Semaphore(settings.VOICE_TRANSCRIBE_CONCURRENCY)
+
+
+async def transcribe_audio(audio_source: Union[str, BinaryIO]) -> str:
     """
     Transcribe audio file to text using Google Speech Recognition
     
     Args:
-        audio_path: Path to audio file (.ogg or .wav)
+        audio_source: Path to an OGG file or an in-memory OGG buffer
+    
+    Returns:
+        Transcribed text or error message
+    """
+    try:
+        raw = _read_audio_bytes(audio_source)
+    except OSError as e:
+        log.error(f"❌ Could not read audio: {e}")
+        return "Failed to process audio file"
+    
+    return await transcribe_audio_bytes(raw)
+
+
+async def transcribe_audio_bytes(ogg_bytes: bytes) -> str:
+    """
+    Transcribe in-memory OGG audio; the bytes are piped to ffmpeg's stdin
+    
+    Args:
+        ogg_bytes: Raw OGG/Opus bytes as downloaded from Telegram
     
     Returns:
         Transcribed text or error message
     """
-    wav_path = None
+    raw = bytes(ogg_bytes)
+    
+    # Redelivered updates and repeated clips skip ffmpeg and Google entirely
+    digest = hashlib.blake2b(raw, digest_size=16).digest()
+    cached = _transcript_cache.get(digest)
+    if cached is not None:
+        log.info("♻️ Transcript cache hit")
+        return cached
+    
+    async with _transcribe_semaphore:
+        return await _transcribe(raw, digest)
+
+
+async def transcribe_audio_batch(audio_sources: List[Union[str, BinaryIO]]) -> List[str]:
+    """
+    Transcribe several audio files concurrently
+    
+    Args:
+        audio_sources: Paths to OGG files or in-memory OGG buffers
     
+    Returns:
+        Transcribed text or error message per source, in input order
+    """
+    return await asyncio.gather(*(transcribe_audio(source) for source in audio_sources))
+
+
+def _read_audio_bytes(audio_source: Union[str, BinaryIO]) -> bytes:
+    """Return the raw bytes of a path or file-like audio source"""
+    if isinstance(audio_source, (str, os.PathLike)):
+        with open(audio_source, "rb") as f:
+            return f.read()
+    audio_source.seek(0)
+    return audio_source.read()
+
+
+async def _transcribe(raw: bytes, digest: bytes) -> str:
+    """Decode and recognize one audio source, caching successful transcripts"""
     try:
-        log.info(f"🎤 Starting transcription for: {audio_path}")
+        log.info("🎤 Starting transcription...")
+        
+        if settings.GOOGLE_CLOUD_STT:
+            try:
+                text = await _recognize_cloud_streaming(raw)
+                if not text:
+                    log.error("❌ Could not understand audio in any language")
+                    return "Sorry, I couldn't understand the audio. Please speak clearly or type your message."
+                log.info(f"✅ Transcription (Cloud STT) successful: '{text}'")
+                _transcript_cache[digest] = text
+                return text
+            except Exception as e:
+                log.warning(f"⚠️ Cloud STT failed, falling back to ffmpeg + Google: {type(e).__name__}: {e}")
         
         # Verify ffmpeg/ffprobe are available
-        if not (ffmpeg_exists and ffprobe_exists):
+        if not _FFMPEG_READY:
             log.error("❌ FFmpeg not properly configured")
             return "Voice transcription unavailable. Please configure FFmpeg."
         
-        # Convert OGG to WAV
-        wav_path = convert_ogg_to_wav(audio_path)
+        # Decode OGG straight to PCM in memory in a worker process
+        loop = asyncio.get_running_loop()
+        pcm = await loop.run_in_executor(_get_voice_pool(), convert_ogg_to_pcm, raw)
         
-        if not wav_path or not os.path.exists(wav_path):
+        if not pcm:
             log.error("❌ Audio conversion failed")
             return "Failed to process audio file"
         
-        log.info(f"✅ Converted to WAV: {wav_path}")
+        log.info(f"✅ Decoded {len(pcm)} bytes of PCM")
         
-        # Transcribe using speech recognition
+        # Transcribe using speech recognition (imported on first voice message)
         import speech_recognition as sr
         
         recognizer = sr.Recognizer()
+        audio_data = sr.AudioData(pcm, SAMPLE_RATE, SAMPLE_WIDTH)
         
-        with sr.AudioFile(wav_path) as source:
-            log.info("🎧 Reading audio data...")
-            # Adjust for ambient noise
-            recognizer.adjust_for_ambient_noise(source, duration=0.5)
-            audio_data = recognizer.record(source)
-            
-            log.info("🔄 Transcribing with Google Speech Recognition...")
-            
-            # Try Hindi first
+        log.info("🔄 Transcribing with Google Speech Recognition...")
+        
+        # Hindi and English run concurrently when the Google STT pool has room
+        # to spare; under load English is only requested if Hindi fails.
+        # Hindi still wins whenever it succeeds.
+        hi_task = asyncio.create_task(_recognize_google(recognizer, audio_data, "hi-IN"))
+        await asyncio.sleep(0)  # let Hindi take its slot first
+        en_task = None
+        if not _google_stt_semaphore.locked():
+            en_task = asyncio.create_task(_recognize_google(recognizer, audio_data, "en-US"))
+            # Mark the English result as retrieved even when Hindi wins
+            en_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+        
+        try:
             try:
-                text = recognizer.recognize_google(audio_data, language="hi-IN")
+                text = await hi_task
                 log.info(f"✅ Transcription (Hindi) successful: '{text}'")
+                _transcript_cache[digest] = text
                 return text
                 
             except sr.UnknownValueError:
-                log.warning("⚠️ Could not understand in Hindi, trying English...")
+                log.warning("⚠️ Could not understand in Hindi, using English...")
+            
+            # Fallback to English
+            try:
+                if en_task is not None:
+                    text = await en_task
+                else:
+                    text = await _recognize_google(recognizer, audio_data, "en-US")
+                log.info(f"✅ Transcription (English) successful: '{text}'")
+                _transcript_cache[digest] = text
+                return text
                 
-                # Fallback to English
-                try:
-                    text = recognizer.recognize_google(audio_data, language="en-US")
-                    log.info(f"✅ Transcription (English) successful: '{text}'")
-                    return text
-                    
-                except sr.UnknownValueError:
-                    log.error("❌ Could not understand audio in any language")
-                    return "Sorry, I couldn't understand the audio. Please speak clearly or type your message."
-                    
-            except sr.RequestError as e:
-                log.error(f"❌ Speech recognition service error: {e}")
-                return "Speech recognition service unavailable. Please type your message."
+            except sr.UnknownValueError:
+                log.error("❌ Could not understand audio in any language")
+                return "Sorry, I couldn't understand the audio. Please speak clearly or type your message."
+                
+        except sr.RequestError as e:
+            log.error(f"❌ Speech recognition service error: {e}")
+            return "Speech recognition service unavailable. Please type your message."
+        
+        finally:
+            # Stops waiting only; a started thread keeps its slot until it returns
+            hi_task.cancel()
+            if en_task is not None:
+                en_task.cancel()
                 
     except Exception as e:
-        log.error(f"❌ Transcription error: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"❌ Transcription error: {type(e).__name__}: {str(e)}")
         return "Error processing voice message. Please try again or type your message."
-        
-    finally:
-        # Cleanup WAV file
-        if wav_path and os.path.exists(wav_path):
-            try:
-                os.remove(wav_path)
-                log.debug(f"🗑️ Cleaned up WAV file: {wav_path}")
-            except Exception as cleanup_error:
-                log.warning(f"Could not delete WAV file: {cleanup_error}")
 
 
-def convert_ogg_to_wav(ogg_path: str) -> str:
+def convert_ogg_to_pcm(ogg_source: Union[str, bytes, BinaryIO]) -> bytes:
     """
-    Convert OGG audio to WAV format using bundled ffmpeg
+    Decode OGG audio to raw mono 16kHz 16-bit PCM using bundled ffmpeg
     
     Args:
-        ogg_path: Path to OGG file
+        ogg_source: Path to an OGG file, raw OGG bytes or an in-memory OGG buffer
     
     Returns:
-        Path to converted WAV file
+        PCM bytes ready for sr.AudioData
     """
     try:
-        log.info(f"🔄 Converting OGG to WAV: {ogg_path}")
-        
-        # Create unique WAV filename
-        unique_id = str(uuid.uuid4())[:8]
-        temp_dir = tempfile.gettempdir()
-        wav_path = os.path.join(temp_dir, f"audio_{unique_id}.wav")
-        
-        # Verify ffmpeg is available
-        if not (ffmpeg_exists and ffprobe_exists):
-            raise FileNotFoundError(
-                f"FFmpeg or FFprobe not found. "
-                f"ffmpeg: {ffmpeg_exists}, ffprobe: {ffprobe_exists}"
-            )
+        log.info("🔄 Decoding OGG to PCM...")
         
-        # Use pydub with bundled ffmpeg
-        from pydub import AudioSegment
+        # One native transcode: decode, downmix to mono, soxr-resample to 16kHz, PCM to stdout
+        if isinstance(ogg_source, (str, os.PathLike)):
+            input_arg, stdin_kwargs = str(ogg_source), {"stdin": subprocess.DEVNULL}
+        elif isinstance(ogg_source, (bytes, bytearray, memoryview)):
+            input_arg, stdin_kwargs = "pipe:0", {"input": ogg_source}
+        else:
+            input_arg, stdin_kwargs = "pipe:0", {"input": ogg_source.read()}
         
-        log.info("🔧 Using bundled ffmpeg for conversion...")
+        result = subprocess.run(
+            [
+                str(FFMPEG_PATH), "-loglevel", "error",
+                "-i", input_arg,
+                "-ac", "1",
+                "-af", "aresample=resampler=soxr", "-ar", str(SAMPLE_RATE),
+                "-f", "s16le", "pipe:1",
+            ],
+            capture_output=True,
+            **stdin_kwargs,
+        )
         
-        # Load OGG file
-        audio = AudioSegment.from_ogg(ogg_path)
-        
-        # Convert to mono 16kHz (optimal for speech recognition)
-        audio = audio.set_channels(1)
-        audio = audio.set_frame_rate(16000)
-        
-        # Export as WAV
-        audio.export(wav_path, format="wav")
+        if result.returncode != 0:
+            log.warning(
+                f"⚠️ ffmpeg exited with {result.returncode}, falling back to pydub: "
+                f"{result.stderr.decode(errors='replace').strip()}"
+            )
+            return _convert_with_pydub(ogg_source)
         
-        log.info(f"✅ Conversion successful: {wav_path}")
-        return wav_path
+        log.info("✅ Decoding successful")
+        return result.stdout
             
     except Exception as e:
         log.error(f"❌ Error converting audio: {type(e).__name__}: {str(e)}")
         raise
+
+
+@functools.lru_cache(maxsize=1)
+def _configure_pydub():
+    """Import pydub on first use and point it at the bundled binaries"""
+    from pydub import AudioSegment
+    AudioSegment.converter = str(FFMPEG_PATH)
+    AudioSegment.ffmpeg = str(FFMPEG_PATH)
+    AudioSegment.ffprobe = str(FFPROBE_PATH)
+    return AudioSegment
+
+
+def _convert_with_pydub(ogg_source: Union[str, bytes, BinaryIO]) -> bytes:
+    """Fallback OGG to PCM decoding through pydub"""
+    AudioSegment = _configure_pydub()
+    
+    if isinstance(ogg_source, (bytes, bytearray, memoryview)):
+        ogg_source = BytesIO(ogg_source)
+    elif not isinstance(ogg_source, (str, os.PathLike)):
+        ogg_source.seek(0)
+    
+    # Let ffmpeg downmix and resample while decoding; pydub's own
+    # set_frame_rate resamples in Python and dominates the CPU cost
+    audio = AudioSegment.from_file(
+        ogg_source,
+        format="ogg",
+        parameters=["-ac", "1", "-ar", str(SAMPLE_RATE)],
+    )
+    audio = audio.set_sample_width(SAMPLE_WIDTH)
+    return audio.raw_data
+
+
+def sweep_temp_audio(max_age_seconds: int = 3600) -> int:
+    """
+    Delete stale audio_*.wav files left in the system temp directory
+    
+    Older builds wrote one WAV per voice message and leaked it if the
+    process died before cleanup.
+    
+    Args:
+        max_age_seconds: Minimum file age before it is removed
+    
+    Returns:
+        Number of files removed
+    """
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for path in Path(tempfile.gettempdir()).glob("audio_*.wav"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink(missing_ok=True)
+                removed += 1
+        except OSError as e:
+            log.warning(f"Could not delete stale audio file {path}: {e}")
+    return removed
@@ -1,4 +1,6 @@
 # config/settings.py
+import functools
+import os
 from pydantic_settings import BaseSettings
 from typing import Optional
 from pathlib import Path
@@ -19,6 +21,7 @@ class Settings(BaseSettings):
     # Telegram Configuration
     TELEGRAM_BOT_TOKEN: str
     WEBHOOK_URL: str = ""
+    TELEGRAM_WEBHOOK_SECRET: str = ""  # Sent back by Telegram as X-Telegram-Bot-Api-Secret-Token
     
     # Database Configuration
     MONGODB_URL: str = "mongodb://localhost:27017"
@@ -59,6 +62,14 @@ class Settings(BaseSettings):
     SURVEILLANCE_INTERVAL_MINUTES: int = 15
     ANOMALY_THRESHOLD: int = 5
     SPIKE_WINDOW_HOURS: int = 24
+    FOLLOWUP_CONCURRENCY: int = 4
+    
+    # Voice
+    VOICE_TRANSCRIBE_CONCURRENCY: int = 8
+    GOOGLE_CLOUD_STT: bool = False  # needs google-cloud-speech + GOOGLE_APPLICATION_CREDENTIALS
+    
+    # Crew
+    CREW_TIMEOUT_SECONDS: int = 60
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -77,13 +88,15 @@ class Settings(BaseSettings):
         extra = "allow"
         # ✅ ADD THIS to prevent multiple loads
         env_file_encoding = "utf-8"
+        # Read-only after load, so the derived configs below can be cached
+        frozen = True
     
-    @property
+    @functools.cached_property
     def mongodb_uri(self) -> str:
         """Get MongoDB connection string"""
         return self.MONGODB_URL
     
-    @property
+    @functools.cached_property
     def ollama_config(self) -> dict:
         """LLM config for Ollama (Triage & Surveillance)"""
         return {
@@ -92,7 +105,7 @@ class Settings(BaseSettings):
             "temperature": self.OLLAMA_TEMPERATURE
         }
     
-    @property
+    @functools.cached_property
     def nvidia_config(self) -> dict:
         """LLM config for NVIDIA NIM (Coordinator & Alert)"""
         return {
@@ -102,6 +115,10 @@ class Settings(BaseSettings):
             "temperature": self.NVIDIA_TEMPERATURE
         }
 
+# Set after the banner is printed; inherited by reloader/worker child processes
+_BANNER_ENV_FLAG = "SWASTHAI_SETTINGS_BANNER_SHOWN"
+
+
 # ✅ Singleton pattern - only load once
 _settings_instance = None
 
@@ -113,12 +130,14 @@ def get_settings() -> Settings:
         _settings_instance.BASE_DIR.joinpath("logs").mkdir(exist_ok=True)
         _settings_instance.DATA_DIR.mkdir(exist_ok=True)
         
-        # Log configuration once
-        print(f"✅ SwasthAI Settings Loaded (Mixed LLM Strategy)")
-        print(f"   - Environment: {_settings_instance.ENVIRONMENT}")
-        print(f"   - Database: {_settings_instance.MONGODB_DB_NAME}")
-        print(f"   - Ollama (Triage/Surveillance): {_settings_instance.OLLAMA_MODEL}")
-        print(f"   - NVIDIA NIM (Coordinator/Alert): {_settings_instance.NVIDIA_MODEL}")
+        # Log configuration once, not again in reloader/worker child processes
+        if not os.environ.get(_BANNER_ENV_FLAG):
+            os.environ[_BANNER_ENV_FLAG] = "1"
+            print(f"✅ SwasthAI Settings Loaded (Mixed LLM Strategy)")
+            print(f"   - Environment: {_settings_instance.ENVIRONMENT}")
+            print(f"   - Database: {_settings_instance.MONGODB_DB_NAME}")
+            print(f"   - Ollama (Triage/Surveillance): {_settings_instance.OLLAMA_MODEL}")
+            print(f"   - NVIDIA NIM (Coordinator/Alert): {_settings_instance.NVIDIA_MODEL}")
     
     return _settings_instance
 
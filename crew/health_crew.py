@@ -1,11 +1,14 @@
 # crew/health_crew.py
 import asyncio
+import functools
+import html
 import re
+import threading
 from crewai import Agent, Crew, Task, Process
 from crewai import LLM
 from config.settings import settings
-from tools.database_tools import get_user_session, write_health_record, update_session
-from tools.telegram_tools import send_telegram_message
+from tools.database_tools import get_user_session, write_health_record, update_session, session_cache_scope
+from tools.telegram_tools import send_telegram_message, cancellable_run
 from tools.anomaly_tools import detect_spike
 from tools.gov_mock_tools import submit_to_mock_authority
 from datetime import datetime
@@ -23,113 +26,35 @@ from tasks import (
 logger = logging.getLogger(__name__)
 
 
-class HealthCrew:
-    def __init__(self):
-        logger.info("Initializing SwasthAI Health Crew...")
-        
-        # Initialize LLM with NVIDIA NIM
-        self.llm = LLM(
-            model="nvidia_nim/mistralai/mistral-medium-3-instruct",
-            api_key=settings.NVIDIA_API_KEY,
-            base_url="https://integrate.api.nvidia.com/v1",
-            temperature=0.7
-        )
-        
-        logger.info("✅ NVIDIA NIM LLM initialized")
-        
-        # Initialize agents
-        self.coordinator_agent = self._create_coordinator_agent()
-        self.triage_agent = self._create_triage_agent()
-        self.surveillance_agent = self._create_surveillance_agent()
-        self.alert_agent = self._create_alert_agent()
-        
-        # Initialize tasks
-        self.intake_task = self._create_intake_task()
-        self.triage_task = self._create_triage_task()
-        self.surveillance_task = self._create_surveillance_task()
-        self.alert_task = self._create_alert_task()
-        
-        # Create crew
-        self.crew = Crew(
-            agents=[
-                self.coordinator_agent,
-                self.triage_agent,
-                self.surveillance_agent,
-                self.alert_agent
-            ],
-            tasks=[
-                self.intake_task,
-                self.triage_task,
-                self.surveillance_task,
-                self.alert_task
-            ],
-            process=Process.sequential,
-            verbose=True,
-            memory=False
-        )
-        
-        logger.info("✅ All agents initialized successfully")
+class CrewRunCancelled(Exception):
+    """Raised inside an abandoned (timed-out) crew run to stop it between tasks"""
 
-    # ========== AGENT CREATION METHODS (Already correct) ==========
-    
-    def _create_coordinator_agent(self) -> Agent:
-        """Coordinator Agent"""
-        return Agent(
-            role="Health Surveillance Coordinator",
-            goal="Orchestrate workflow and route messages",
-            backstory="Central orchestrator of health surveillance system",
-            tools=[get_user_session],
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False,
-            max_iter=1  # ✅ Only 1 iteration
-        )
 
-    def _create_triage_agent(self) -> Agent:
-        """Triage Agent"""
-        return Agent(
-            role="Healthcare Triage Specialist",
-            goal="Assess symptoms and provide health recommendations",
-            backstory="Experienced healthcare professional in emergency medicine",
-            tools=[get_user_session, write_health_record, update_session, send_telegram_message],
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False,
-            max_iter=5  # ✅ Only 1 iteration
-        )
+def _stop_if_cancelled(cancelled: threading.Event, task_output):
+    """Crew task_callback: end a timed-out run before its next task starts"""
+    if cancelled.is_set():
+        raise CrewRunCancelled("crew run cancelled after timeout")
 
-    def _create_surveillance_agent(self) -> Agent:
-        """Surveillance Agent"""
-        return Agent(
-            role="Public Health Surveillance Analyst",
-            goal="Detect disease patterns and emerging health threats",
-            backstory="Epidemiologist specializing in disease surveillance",
-            tools=[get_user_session, detect_spike, submit_to_mock_authority],
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False,
-            max_iter=1  # ✅ Only 1 iteration
-        )
 
-    def _create_alert_agent(self) -> Agent:
-        """Alert Agent"""
-        return Agent(
-            role="Health Communication Specialist",
-            goal="Deliver timely health alerts to communities",
-            backstory="Public health communicator skilled in crisis communication",
-            tools=[send_telegram_message, submit_to_mock_authority],
-            llm=self.llm,
-            verbose=True,
-            allow_delegation=False,
-            max_iter=1  # ✅ Only 1 iteration
-        )
+@functools.lru_cache(maxsize=1)
+def get_nvidia_llm() -> LLM:
+    """Get the shared NVIDIA NIM LLM (per-run crew copies reuse it too)"""
+    return LLM(**settings.nvidia_config)
 
-    # ========== TASK CREATION METHODS (FIX INDENTATION HERE) ==========
-    
-    def _create_intake_task(self) -> Task:  # ✅ INDENTED - part of class
-        """Coordinator routes without messaging"""
-        return Task(
-            description="""You are the Coordinator. Analyze user {telegram_id}'s message.
+
+# Intake questions the triage prompt sends on first contact
+_FIRST_CONTACT_MESSAGE = """Hello {user_name}, I understand you mentioned: {message}.
+
+To provide accurate assessment:
+
+1️⃣ What is your location (city/area)?
+2️⃣ Any other symptoms besides what you mentioned?
+3️⃣ Pre-existing conditions or current medications?
+
+Please share these details."""
+
+# Task prompts: static text built once at import; CrewAI fills the {placeholders} per kickoff
+_INTAKE_DESCRIPTION = """You are the Coordinator. Analyze user {telegram_id}'s message.
 
 Message: "{message}"
 Session: {session_data}
@@ -144,15 +69,9 @@ Your job:
 **DO NOT call send_telegram_message.**
 **Only analyze and route.**
 
-Output: Message type and context for Triage Agent""",
-            expected_output="Routing decision with context",
-            agent=self.coordinator_agent
-        )
+Output: Message type and context for Triage Agent"""
 
-    def _create_triage_task(self) -> Task:
-        """Triage must USE send_telegram_message tool"""
-        return Task(
-            description="""You are the Triage Agent for user {telegram_id}.
+_TRIAGE_DESCRIPTION = """You are the Triage Agent for user {telegram_id}.
 
     Message: "{message}"
     Session: {session_data}
@@ -259,18 +178,9 @@ Output: Message type and context for Triage Agent""",
     - Replace ALL [BRACKETS] with actual values
 
     telegram_id: {telegram_id}
-    user_name: {user_name}""",
-            expected_output="Message sent via send_telegram_message tool",
-            agent=self.triage_agent,
-            context=[self.intake_task]
-        )
-
+    user_name: {user_name}"""
 
-
-    def _create_surveillance_task(self) -> Task:  # ✅ INDENTED - part of class
-        """Surveillance runs silently"""
-        return Task(
-            description="""You are the Surveillance Agent.
+_SURVEILLANCE_DESCRIPTION = """You are the Surveillance Agent.
 
 Current user: {telegram_id}
 Health record: From Triage Agent's output
@@ -285,16 +195,9 @@ Your job:
 **DO NOT call send_telegram_message.**
 **Surveillance runs silently in the background.**
 
-Only flag critical outbreaks for Alert Agent.""",
-            expected_output="Surveillance analysis complete (no user message)",
-            agent=self.surveillance_agent,
-            context=[self.triage_task]
-        )
+Only flag critical outbreaks for Alert Agent."""
 
-    def _create_alert_task(self) -> Task:  # ✅ INDENTED - part of class
-        """Alert only for community-wide issues"""
-        return Task(
-            description="""You are the Alert Agent.
+_ALERT_DESCRIPTION = """You are the Alert Agent.
 
 Surveillance findings: From previous task
 Current user: {telegram_id}
@@ -314,7 +217,139 @@ If outbreak detected:
 - Notify authorities: submit_to_mock_authority(...)
 - Send community alert (optional)
 
-Otherwise: Stay silent, do nothing.""",
+Otherwise: Stay silent, do nothing."""
+
+
+class HealthCrew:
+    def __init__(self):
+        logger.info("Initializing SwasthAI Health Crew...")
+        
+        # Initialize LLM with NVIDIA NIM (one shared instance per process)
+        self.llm = get_nvidia_llm()
+        
+        logger.info("✅ NVIDIA NIM LLM initialized")
+        
+        # Initialize agents
+        self.coordinator_agent = self._create_coordinator_agent()
+        self.triage_agent = self._create_triage_agent()
+        self.surveillance_agent = self._create_surveillance_agent()
+        self.alert_agent = self._create_alert_agent()
+        
+        # Initialize tasks
+        self.intake_task = self._create_intake_task()
+        self.triage_task = self._create_triage_task()
+        self.surveillance_task = self._create_surveillance_task()
+        self.alert_task = self._create_alert_task()
+        
+        # Create crew
+        self.crew = Crew(
+            agents=[
+                self.coordinator_agent,
+                self.triage_agent,
+                self.surveillance_agent,
+                self.alert_agent
+            ],
+            tasks=[
+                self.intake_task,
+                self.triage_task,
+                self.surveillance_task,
+                self.alert_task
+            ],
+            process=Process.sequential,
+            verbose=settings.DEBUG,
+            memory=False
+        )
+        
+        logger.info("✅ All agents initialized successfully")
+
+    # ========== AGENT CREATION METHODS (Already correct) ==========
+    
+    def _create_coordinator_agent(self) -> Agent:
+        """Coordinator Agent"""
+        return Agent(
+            role="Health Surveillance Coordinator",
+            goal="Orchestrate workflow and route messages",
+            backstory="Central orchestrator of health surveillance system",
+            tools=[get_user_session],
+            llm=self.llm,
+            verbose=settings.DEBUG,
+            allow_delegation=False,
+            max_iter=1  # ✅ Only 1 iteration
+        )
+
+    def _create_triage_agent(self) -> Agent:
+        """Triage Agent"""
+        return Agent(
+            role="Healthcare Triage Specialist",
+            goal="Assess symptoms and provide health recommendations",
+            backstory="Experienced healthcare professional in emergency medicine",
+            tools=[get_user_session, write_health_record, update_session, send_telegram_message],
+            llm=self.llm,
+            verbose=settings.DEBUG,
+            allow_delegation=False,
+            max_iter=5  # ✅ Only 1 iteration
+        )
+
+    def _create_surveillance_agent(self) -> Agent:
+        """Surveillance Agent"""
+        return Agent(
+            role="Public Health Surveillance Analyst",
+            goal="Detect disease patterns and emerging health threats",
+            backstory="Epidemiologist specializing in disease surveillance",
+            tools=[get_user_session, detect_spike, submit_to_mock_authority],
+            llm=self.llm,
+            verbose=settings.DEBUG,
+            allow_delegation=False,
+            max_iter=1  # ✅ Only 1 iteration
+        )
+
+    def _create_alert_agent(self) -> Agent:
+        """Alert Agent"""
+        return Agent(
+            role="Health Communication Specialist",
+            goal="Deliver timely health alerts to communities",
+            backstory="Public health communicator skilled in crisis communication",
+            tools=[send_telegram_message, submit_to_mock_authority],
+            llm=self.llm,
+            verbose=settings.DEBUG,
+            allow_delegation=False,
+            max_iter=1  # ✅ Only 1 iteration
+        )
+
+    # ========== TASK CREATION METHODS (FIX INDENTATION HERE) ==========
+    
+    def _create_intake_task(self) -> Task:  # ✅ INDENTED - part of class
+        """Coordinator routes without messaging"""
+        return Task(
+            description=_INTAKE_DESCRIPTION,
+            expected_output="Routing decision with context",
+            agent=self.coordinator_agent
+        )
+
+    def _create_triage_task(self) -> Task:
+        """Triage must USE send_telegram_message tool"""
+        return Task(
+            description=_TRIAGE_DESCRIPTION,
+            expected_output="Message sent via send_telegram_message tool",
+            agent=self.triage_agent,
+            context=[self.intake_task]
+        )
+
+
+
+    def _create_surveillance_task(self) -> Task:  # ✅ INDENTED - part of class
+        """Surveillance runs silently"""
+        return Task(
+            description=_SURVEILLANCE_DESCRIPTION,
+            expected_output="Surveillance analysis complete (no user message)",
+            agent=self.surveillance_agent,
+            context=[self.triage_task]
+        )
+
+    def _create_alert_task(self) -> Task:  # ✅ INDENTED - part of class
+        """Alert only for community-wide issues"""
+        return Task(
+            description=_ALERT_DESCRIPTION,
             expected_output="Alert sent only if outbreak (usually silent)",
             agent=self.alert_agent,
             context=[self.surveillance_task]
@@ -322,6 +357,34 @@ Otherwise: Stay silent, do nothing.""",
 
     # ========== MESSAGE PROCESSING METHOD ==========
     
+    async def _send_first_contact_questions(self, telegram_id: str, message: str, user_name: str):
+        """Triage's FIRST CONTACT branch without the crew: send the intake questions"""
+        logger.info(f"⚡ First contact for user {telegram_id}; sending intake questions directly")
+        
+        text = _FIRST_CONTACT_MESSAGE.format(
+            user_name=html.escape(user_name),
+            message=html.escape(message),
+        )
+        await asyncio.to_thread(
+            send_telegram_message.run,
+            chat_id=telegram_id,
+            message=text,
+            parse_mode="HTML",
+        )
+        await asyncio.to_thread(
+            update_session.run,
+            telegram_id=telegram_id,
+            session_state="AWAITING_DETAILS",
+            context={"questions_asked": True, "initial_symptom": message},
+        )
+        
+        # The questions already went out via Telegram; nothing for the handler to reply
+        logger.info(f"✅ Initial questions sent to {telegram_id}, awaiting user response")
+        return {
+            "status": "success",
+            "reply_sent": True
+        }
+    
     # ✅ ADD 'async' keyword
     async def process_user_message(
         self, 
@@ -355,6 +418,13 @@ Otherwise: Stay silent, do nothing.""",
                 context = session_data.get('context', {})
                 if isinstance(context, dict):
                     user_name = context.get('user_name', 'User')
+                    
+                    # First contact is a fixed script (ask for details, flag
+                    # questions_asked): run it directly instead of via the LLM loop
+                    if not context.get('questions_asked'):
+                        return await self._send_first_contact_questions(
+                            str(telegram_id), message, user_name
+                        )
             
             # Prepare inputs
             crew_inputs = {
@@ -367,8 +437,25 @@ Otherwise: Stay silent, do nothing.""",
                 'language': language
             }
             
-            # Kickoff crew
-            result = self.crew.kickoff(inputs=crew_inputs)
+            # Kickoff crew in a worker thread so the event loop keeps serving
+            # other users. kickoff interpolates inputs into the shared tasks,
+            # so each run gets its own copy; agents share one
+            # get_user_session lookup per run.
+            # The thread can't be interrupted on timeout, so the run is flagged
+            # instead: its Telegram tools stop sending and it ends after the
+            # current task, freeing the executor thread.
+            cancelled = threading.Event()
+            crew = self.crew.copy()
+            crew.task_callback = functools.partial(_stop_if_cancelled, cancelled)
+            with session_cache_scope(), cancellable_run(cancelled):
+                try:
+                    result = await asyncio.wait_for(
+                        asyncio.to_thread(crew.kickoff, inputs=crew_inputs),
+                        timeout=settings.CREW_TIMEOUT_SECONDS,
+                    )
+                except asyncio.TimeoutError:
+                    cancelled.set()
+                    raise
             
             logger.info(f"✅ Crew processing complete")
             
@@ -378,10 +465,15 @@ Otherwise: Stay silent, do nothing.""",
                 "result": str(result.raw) if hasattr(result, 'raw') else str(result)
             }
             
+        except asyncio.TimeoutError:
+            logger.error(f"⏱️ Crew timed out after {settings.CREW_TIMEOUT_SECONDS}s for user {telegram_id}")
+            return {
+                "status": "error",
+                "error": f"Crew timed out after {settings.CREW_TIMEOUT_SECONDS}s"
+            }
+            
         except Exception as e:
-            logger.error(f"❌ Error processing user message: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"❌ Error processing user message: {str(e)}")
             
             # Return error dict
             return {
@@ -391,13 +483,8 @@ Otherwise: Stay silent, do nothing.""",
 
 
 # Singleton pattern
-_health_crew_instance = None
-
-
+@functools.lru_cache(maxsize=1)
 def get_health_crew() -> HealthCrew:
     """Get or create the HealthCrew singleton"""
-    global _health_crew_instance
-    if _health_crew_instance is None:
-        logger.info("Creating new HealthCrew instance...")
-        _health_crew_instance = HealthCrew()
-    return _health_crew_instance
+    logger.info("Creating new HealthCrew instance...")
+    return HealthCrew()
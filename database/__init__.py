@@ -1,7 +1,8 @@
 # database/__init__.py
 
-from pymongo import MongoClient
-from config.settings import settings
+import asyncio
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from config.mongo import client, db
 from utils.logger import log
 from builtins import Exception
 # Import your existing models
@@ -9,17 +10,28 @@ from .models import (
     User,
     Session,
     HealthRecord,
+    HealthRecordRow,
+    SessionContext,
     Alert,
     SurveillanceLog,
     RiskLevel,
     SessionState,
+    HealthRecordListAdapter,
+    AlertListAdapter,
+    SessionListAdapter,
+    EventAdapter,
+    dump_for_mongo,
+    dump_records_json,
+    symptom_mask,
+    SYMPTOM_FEVER,
+    SYMPTOM_COUGH,
+    SYMPTOM_BREATHING,
 )
 
-# ADD THIS: MongoDB Client Setup
-mongo_client = MongoClient(settings.MONGODB_URL)
-db = mongo_client[settings.MONGODB_DB_NAME]
+# MongoDB Client Setup: share the async Motor client from config.mongo
+mongo_client = client
 
-# ADD THIS: Collection References
+# Collection References (Motor; await every call)
 users_collection = db['users']
 sessions_collection = db['sessions']
 health_records_collection = db['health_records']
@@ -27,21 +39,85 @@ alerts_collection = db['alerts']
 surveillance_logs_collection = db['surveillance_logs']
 
 
-# ADD THIS: Initialize Database Function
-def init_db():
-    """Initialize MongoDB indexes for performance"""
-    try:
-        # Create indexes for fast queries
-        users_collection.create_index("telegram_id", unique=True)
-        health_records_collection.create_index("user_id")
-        health_records_collection.create_index("reported_at")
-        sessions_collection.create_index([("user_id", 1), ("last_activity", -1)])
-        alerts_collection.create_index("created_at")
-        surveillance_logs_collection.create_index("timestamp")
-        
+# Indexes per collection; each list is sent as a single createIndexes command
+_INDEXES = {
+    "users": [
+        IndexModel("telegram_id", unique=True),
+    ],
+    "sessions": [
+        # Active-session lookups (webhook ensure_active_session / tools)
+        IndexModel([("telegram_id", ASCENDING), ("session_state", ASCENDING), ("started_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("session_state", ASCENDING), ("started_at", DESCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("last_activity", DESCENDING)]),
+    ],
+    "health_records": [
+        IndexModel("user_id"),
+        IndexModel("reported_at"),
+        IndexModel([("telegram_id", ASCENDING), ("reported_at", DESCENDING)]),
+        IndexModel([("reported_bucket", ASCENDING), ("location", ASCENDING)]),
+        # Partial index: only records that can ever become due are indexed
+        IndexModel(
+            [("requires_followup", ASCENDING), ("followup_completed", ASCENDING), ("followup_date", ASCENDING)],
+            partialFilterExpression={"requires_followup": True, "followup_completed": False},
+            name="followups_due_idx",
+            background=True,
+        ),
+        IndexModel([("risk_level", ASCENDING)], name="risk_level_idx", background=True),
+    ],
+    "alerts": [
+        IndexModel("created_at"),
+    ],
+    "surveillance_logs": [
+        IndexModel("timestamp"),
+    ],
+}
+
+
+# Initialize Database Function (awaited once from the FastAPI lifespan)
+async def init_db():
+    """Initialize MongoDB indexes for performance
+    
+    create_indexes is idempotent, so this is safe on every startup. The
+    collections are indexed concurrently and independently, so one failure
+    (e.g. duplicate telegram_ids blocking the unique index) doesn't prevent
+    the others.
+    """
+    results = await asyncio.gather(
+        *(db[name].create_indexes(models) for name, models in _INDEXES.items()),
+        return_exceptions=True,
+    )
+    failed = False
+    for name, result in zip(_INDEXES, results):
+        if isinstance(result, Exception):
+            failed = True
+            log.error(f"❌ MongoDB init error on {name}: {result}")
+    if not failed:
         log.info("✅ MongoDB initialized with indexes")
-    except Exception as e:
-        log.error(f"❌ MongoDB init error: {e}")
+
+
+async def bulk_insert_records(collection, records, batch_size: int = 500) -> int:
+    """Insert models with unordered insert_many calls, streamed in batches
+    
+    Args:
+        collection: Motor collection to write to
+        records: Iterable of MongoModel instances (a generator is fine)
+        batch_size: Documents per insert_many round trip
+    
+    Returns:
+        Number of documents inserted
+    """
+    inserted = 0
+    batch = []
+    for record in records:
+        batch.append(dump_for_mongo(record))
+        if len(batch) >= batch_size:
+            result = await collection.insert_many(batch, ordered=False)
+            inserted += len(result.inserted_ids)
+            batch = []
+    if batch:
+        result = await collection.insert_many(batch, ordered=False)
+        inserted += len(result.inserted_ids)
+    return inserted
 
 
 # Update exports
@@ -50,12 +126,23 @@ __all__ = [
     "User",
     "Session",
     "HealthRecord",
+    "HealthRecordRow",
+    "SessionContext",
+    "symptom_mask",
+    "SYMPTOM_FEVER",
+    "SYMPTOM_COUGH",
+    "SYMPTOM_BREATHING",
     "Alert",
     "SurveillanceLog",
     "RiskLevel",
     "SessionState",
+    "HealthRecordListAdapter",
+    "AlertListAdapter",
+    "SessionListAdapter",
+    "EventAdapter",
     
     # ADD THIS: MongoDB client and collections
+    "client",
     "db",
     "mongo_client",
     "users_collection",
@@ -64,4 +151,7 @@ __all__ = [
     "alerts_collection",
     "surveillance_logs_collection",
     "init_db",
+    "dump_for_mongo",
+    "dump_records_json",
+    "bulk_insert_records",
 ]
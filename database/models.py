@@ -1,9 +1,27 @@
+import calendar
+import functools
+import sys
+from collections import Counter
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from enum import Enum
-from typing import Any, Dict, List, Optional
+from itertools import chain
+from typing import Annotated, Any, ClassVar, Dict, Iterable, List, Literal, Optional, Tuple, Union, get_args
 
-from pydantic import BaseModel, Field, ConfigDict
 from bson import ObjectId
+from pydantic import BaseModel, Field, ConfigDict, TypeAdapter, field_validator, with_config
+from typing_extensions import TypedDict
+
+# Bound once so default factories skip the attribute lookup
+_utcnow = datetime.utcnow
+_OID = ObjectId
+_STR = str
+
+
+def _new_oid_str() -> str:
+    """Default `id`: a fresh ObjectId as a hex string."""
+    return _STR(_OID())
+
 
 class RiskLevel(str, Enum):
     LOW = "low"
@@ -26,31 +44,177 @@ class ConversationState(str, Enum):
     DETAILS_COLLECTED = "details_collected"
     ASSESSMENT_GIVEN = "assessment_given"
 
-class Session(BaseModel):
-    id: str = Field(default_factory=lambda: str(ObjectId()))
-    user_id: str
-    telegram_id: str
-    session_state: str = "initial"
-    conversation_state: str = ConversationState.INITIAL  # ✅ Add this
-    context: dict = {}
-    current_question: int = 0
-    symptoms_collected: list = []
-    location: str = None  # ✅ Add location
-    additional_details: dict = {}  # ✅ Add extra details
-    started_at: datetime = Field(default_factory=datetime.utcnow)
-    last_activity: datetime = Field(default_factory=datetime.utcnow)
+
+# Field annotations use Literal (validated as a plain string set in pydantic-core);
+# the Enums above stay for readable comparisons in code.
+RiskLevelT = Literal["low", "moderate", "high", "critical"]
+SessionStateT = Literal["initial", "in_triage", "awaiting_response", "completed", "follow_up"]
+ConversationStateT = Literal["initial", "awaiting_details", "details_collected", "assessment_given"]
+
+RISK_LEVELS = get_args(RiskLevelT)
+
+
+def _lower_risk_level(value: Any) -> Any:
+    """Stored risk levels are uppercase ("HIGH"); the Literal types are lowercase."""
+    return value.lower() if isinstance(value, str) else value
+SESSION_STATES = get_args(SessionStateT)
+CONVERSATION_STATES = get_args(ConversationStateT)
+
+
+# Hourly integer buckets (floor(epoch / B)) for time-range grouping and lookups
+REPORT_BUCKET_SECONDS = 3600
+
+
+def report_bucket(ts: datetime) -> int:
+    """Hour bucket for a timestamp; naive datetimes are treated as UTC."""
+    return calendar.timegm(ts.utctimetuple()) // REPORT_BUCKET_SECONDS
+
+
+# Symptom flag bits; a record's flags are tested with one `&` on symptom_mask
+SYMPTOM_FEVER = 1 << 0
+SYMPTOM_COUGH = 1 << 1
+SYMPTOM_BREATHING = 1 << 2
+
+# Matched as substrings of free-text symptoms ("high fever", "shortness of breath")
+SYMPTOM_KEYWORD_BITS = (
+    ("fever", SYMPTOM_FEVER),
+    ("cough", SYMPTOM_COUGH),
+    ("breath", SYMPTOM_BREATHING),
+    ("shortness", SYMPTOM_BREATHING),
+)
+
+
+@functools.lru_cache(maxsize=1024)
+def _symptom_bits(symptom: str) -> int:
+    """Flag bits for one symptom string (cached: the vocabulary is small)."""
+    text = symptom.lower()
+    mask = 0
+    for keyword, bit in SYMPTOM_KEYWORD_BITS:
+        if keyword in text:
+            mask |= bit
+    return mask
+
+
+def fever_flag(mask: int, temperature: Optional[float] = None) -> bool:
+    """A measured temperature wins; otherwise fall back to the reported symptoms."""
+    if temperature:
+        return temperature > 37.5
+    return bool(mask & SYMPTOM_FEVER)
+
+
+# Common symptoms, interned up front; every symptom/location string stored on a
+# record is interned too, so repeats share one object and compare by identity
+SYMPTOM_VOCAB = frozenset(
+    sys.intern(s)
+    for s in ("fever", "cough", "breathing_difficulty", "fatigue", "sore_throat", "headache", "diarrhea")
+)
+
+
+def intern_symptoms(symptoms: List[str]) -> List[str]:
+    """Intern each symptom string in place and return the list."""
+    for i, symptom in enumerate(symptoms):
+        if isinstance(symptom, str):
+            symptoms[i] = sys.intern(symptom)
+    return symptoms
+
+
+def symptom_mask(symptoms: Iterable[str]) -> int:
+    """OR together the flag bits of every symptom in a report."""
+    mask = 0
+    for symptom in symptoms:
+        mask |= _symptom_bits(str(symptom))
+    return mask
+
+class _ReadOnlyDict(dict):
+    """Empty dict that refuses mutation, shared as a default across instances.
+
+    Subclassing dict (rather than MappingProxyType) keeps it valid for
+    pydantic serialization and BSON encoding.
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("shared empty default is read-only; use Session.with_context()")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+
+# One shared instance instead of a fresh {} per Session
+_EMPTY_DICT = _ReadOnlyDict()
+
+
+def _empty_dict() -> Dict[str, Any]:
+    return _EMPTY_DICT
+
+
+# Known session context keys (written by the crew and first-contact flow);
+# agents may add others, which are kept as-is
+@with_config(ConfigDict(extra="allow"))
+class SessionContext(TypedDict, total=False):
+    questions_asked: bool
+    initial_symptom: str
+    user_name: str
+
 
 class MongoModel(BaseModel):
     """Base model that maps MongoDB `_id` to `id` for convenience."""
 
-    id: Optional[str] = Field(default=None, alias="_id")
+    id: Optional[str] = Field(default_factory=_new_oid_str, alias="_id")
 
+    # Instances are immutable (use model_copy(update=...) to change one), and
+    # each subclass builds its core schema on first use instead of at import
     model_config = ConfigDict(
         populate_by_name=True,
         arbitrary_types_allowed=True,
         from_attributes=True,
+        frozen=True,
+        defer_build=True,
     )
 
+    # Field names per subclass, computed once when the class is created
+    _mongo_fields: ClassVar[Tuple[str, ...]] = ()
+
+    @classmethod
+    def __pydantic_init_subclass__(cls, **kwargs: Any) -> None:
+        super().__pydantic_init_subclass__(**kwargs)
+        cls._mongo_fields = tuple(cls.model_fields)
+
+    def to_mongo(self) -> Dict[str, Any]:
+        """Write-side dump: raw field values with `_id` aliased and None dropped.
+
+        Skips model_dump's schema walk; use model_dump for API responses.
+        """
+        values = self.__dict__
+        doc = {}
+        for name in self._mongo_fields:
+            value = values.get(name)
+            if value is _EMPTY_DICT:
+                value = {}  # documents leave here mutable
+            if value is not None:
+                doc[name] = value
+        if "id" in doc:
+            doc["_id"] = doc.pop("id")
+        return doc
+
+    @classmethod
+    def from_mongo(cls, doc: Optional[Dict[str, Any]]):
+        """Hydrate from a trusted MongoDB document without re-validating.
+
+        Only for documents read back from our own collections. Inbound
+        Telegram/user payloads must still go through `model_validate`.
+        """
+        if doc is None:
+            return None
+        data = dict(doc)
+        _id = data.pop("_id", None)
+        data["id"] = str(_id) if _id is not None else None
+        return cls.model_construct(**data)
+
+    @classmethod
+    def from_json_bytes(cls, payload: bytes):
+        """Validate straight from JSON bytes via pydantic-core's Rust parser."""
+        return cls.model_validate_json(payload)
+
 
 class User(MongoModel):
     telegram_id: str
@@ -62,47 +226,134 @@ class User(MongoModel):
     age: Optional[int] = None
     gender: Optional[str] = None
     preferred_language: str = Field(default="en")
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
+    updated_at: datetime = Field(default_factory=_utcnow)
 
 
 class Session(MongoModel):
+    user_id: Optional[str] = None
     telegram_id: str
-    session_state: SessionState = SessionState.INITIAL
-    context: Dict[str, Any] = Field(default_factory=dict)
+    session_state: SessionStateT = SessionState.INITIAL.value
+    conversation_state: ConversationStateT = ConversationState.INITIAL.value
+    context: SessionContext = Field(default_factory=_empty_dict)
     current_question: int = 0
     symptoms_collected: List[str] = Field(default_factory=list)
-    started_at: datetime = Field(default_factory=datetime.utcnow)
-    last_activity: datetime = Field(default_factory=datetime.utcnow)
+    location: Optional[str] = None
+    additional_details: Dict[str, Any] = Field(default_factory=_empty_dict)
+    started_at: datetime = Field(default_factory=_utcnow)
+    last_activity: datetime = Field(default_factory=_utcnow)
     completed_at: Optional[datetime] = None
 
+    def with_context(self, **updates: Any) -> "Session":
+        """Copy-on-write: a new Session whose context has `updates` merged in."""
+        return self.model_copy(update={"context": {**self.context, **updates}})
+
 
 class HealthRecord(MongoModel):
+    kind: Literal["health_record"] = "health_record"
     telegram_id: str
     session_id: Optional[str] = None
     symptoms: List[str]
-    symptom_details: Dict[str, Any] = Field(default_factory=dict)
-    risk_level: RiskLevel
+    symptom_mask: int = Field(default_factory=lambda data: symptom_mask(data["symptoms"]))
+    symptom_details: Any = Field(default_factory=dict)  # opaque agent JSON, not validated
+    risk_level: RiskLevelT
     severity_score: float = 0.0
     location: Optional[str] = None
-    reported_at: datetime = Field(default_factory=datetime.utcnow)
+    reported_at: datetime = Field(default_factory=_utcnow)
+    reported_bucket: int = Field(default_factory=lambda data: report_bucket(data["reported_at"]))
     symptom_onset: Optional[datetime] = None
     temperature: Optional[float] = None
-    has_fever: bool = False
-    has_cough: bool = False
-    has_breathing_difficulty: bool = False
+    # Derived from symptom_mask (and temperature) unless given explicitly
+    has_fever: bool = Field(default_factory=lambda data: fever_flag(data["symptom_mask"], data["temperature"]))
+    has_cough: bool = Field(default_factory=lambda data: bool(data["symptom_mask"] & SYMPTOM_COUGH))
+    has_breathing_difficulty: bool = Field(
+        default_factory=lambda data: bool(data["symptom_mask"] & SYMPTOM_BREATHING)
+    )
     requires_followup: bool = False
     followup_date: Optional[datetime] = None
     followup_completed: bool = False
     agent_assessment: Optional[str] = None
     recommendations: List[str] = Field(default_factory=list)
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
     severity_notes: Optional[str] = None
 
+    @field_validator("risk_level", mode="before")
+    @classmethod
+    def _normalize_risk_level(cls, value: Any) -> Any:
+        return _lower_risk_level(value)
+
+    @field_validator("symptoms")
+    @classmethod
+    def _intern_symptoms(cls, value: List[str]) -> List[str]:
+        return intern_symptoms(value)
+
+    @field_validator("location")
+    @classmethod
+    def _intern_location(cls, value: Optional[str]) -> Optional[str]:
+        return sys.intern(value) if value is not None else None
+
+
+@dataclass(slots=True)
+class HealthRecordRow:
+    """Unvalidated internal health record used on the Mongo write path.
+
+    Much cheaper to build than HealthRecord; call `to_model()` only when a
+    validated pydantic instance is needed at an API boundary.
+    """
+
+    telegram_id: str
+    symptoms: List[str]
+    risk_level: str
+    severity_score: float = 0.0
+    symptom_mask: Optional[int] = None
+    user_id: Optional[str] = None
+    session_id: Optional[str] = None
+    symptom_details: Any = field(default_factory=dict)
+    location: Optional[str] = None
+    reported_at: datetime = field(default_factory=_utcnow)
+    reported_bucket: Optional[int] = None
+    temperature: Optional[float] = None
+    has_fever: Optional[bool] = None  # None: derive from symptom_mask
+    has_cough: Optional[bool] = None
+    has_breathing_difficulty: Optional[bool] = None
+    agent_assessment: Optional[str] = None
+    recommendations: List[str] = field(default_factory=list)
+    requires_followup: bool = False
+    followup_date: Optional[datetime] = None
+    followup_completed: bool = False
+    created_at: datetime = field(default_factory=_utcnow)
+
+    def __post_init__(self):
+        intern_symptoms(self.symptoms)
+        if self.location is not None:
+            self.location = sys.intern(self.location)
+        if self.reported_bucket is None:
+            self.reported_bucket = report_bucket(self.reported_at)
+        if self.symptom_mask is None:
+            self.symptom_mask = symptom_mask(self.symptoms)
+        if self.has_fever is None:
+            self.has_fever = fever_flag(self.symptom_mask, self.temperature)
+        if self.has_cough is None:
+            self.has_cough = bool(self.symptom_mask & SYMPTOM_COUGH)
+        if self.has_breathing_difficulty is None:
+            self.has_breathing_difficulty = bool(self.symptom_mask & SYMPTOM_BREATHING)
+
+    def to_mongo(self) -> Dict[str, Any]:
+        """Shallow document for insert_one (no deepcopy, unlike asdict)."""
+        return {name: getattr(self, name) for name in _HEALTH_RECORD_ROW_FIELDS}
+
+    def to_model(self) -> HealthRecord:
+        """Validate into the pydantic HealthRecord."""
+        return HealthRecord.model_validate(self.to_mongo())
+
+
+_HEALTH_RECORD_ROW_FIELDS = tuple(f.name for f in fields(HealthRecordRow))
+
 
 class Alert(MongoModel):
+    kind: Literal["alert"] = "alert"
     alert_type: str
-    severity: RiskLevel
+    severity: RiskLevelT
     title: str
     message: str
     affected_location: Optional[str] = None
@@ -111,16 +362,24 @@ class Alert(MongoModel):
     anomaly_score: float = 0.0
     sent_to_users: List[str] = Field(default_factory=list)
     sent_to_authorities: bool = False
-    created_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=_utcnow)
     sent_at: Optional[datetime] = None
     is_resolved: bool = False
     resolved_at: Optional[datetime] = None
 
+    @field_validator("severity", mode="before")
+    @classmethod
+    def _normalize_severity(cls, value: Any) -> Any:
+        return _lower_risk_level(value)
+
 
 class SurveillanceLog(MongoModel):
-    run_at: datetime = Field(default_factory=datetime.utcnow)
+    kind: Literal["surveillance_log"] = "surveillance_log"
+    run_at: datetime = Field(default_factory=_utcnow)
     window_start: datetime
     window_end: datetime
+    window_bucket_start: int = Field(default_factory=lambda data: report_bucket(data["window_start"]))
+    window_bucket_end: int = Field(default_factory=lambda data: report_bucket(data["window_end"]))
     total_reports: int = 0
     symptom_counts: Dict[str, int] = Field(default_factory=dict)
     location_counts: Dict[str, int] = Field(default_factory=dict)
@@ -128,3 +387,61 @@ class SurveillanceLog(MongoModel):
     alert_triggered: bool = False
     alert_id: Optional[str] = None
     analysis_details: Dict[str, Any] = Field(default_factory=dict)
+
+    @classmethod
+    def from_reports(
+        cls,
+        reports: Iterable[Any],
+        window_start: datetime,
+        window_end: datetime,
+        **kwargs: Any,
+    ) -> "SurveillanceLog":
+        """Aggregate health records (models or raw Mongo dicts) into one log.
+
+        Counting happens in Counter's C loop over flat symptom/location
+        columns instead of per-row dict.get increments.
+        """
+        reports = list(reports)
+        symptoms = chain.from_iterable(_report_field(r, "symptoms") or () for r in reports)
+        locations = (_report_field(r, "location") or "Unknown" for r in reports)
+        return cls(
+            window_start=window_start,
+            window_end=window_end,
+            total_reports=len(reports),
+            symptom_counts=Counter(symptoms),
+            location_counts=Counter(locations),
+            **kwargs,
+        )
+
+
+def _report_field(report: Any, name: str) -> Any:
+    """Read a field from either a raw Mongo document or a model instance."""
+    if isinstance(report, dict):
+        return report.get(name)
+    return getattr(report, name, None)
+
+
+def dump_for_mongo(model: MongoModel) -> Dict[str, Any]:
+    """Document for insertion, with the model's `id` stored as an ObjectId `_id`."""
+    doc = model.to_mongo()
+    _id = doc.pop("_id", None)
+    doc["_id"] = _OID(_id) if _id else _OID()
+    return doc
+
+
+# Created once at import (schemas are built on first use); reuse for batch
+# validation instead of per-call parsing
+_DEFERRED = ConfigDict(defer_build=True)
+HealthRecordListAdapter = TypeAdapter(List[HealthRecord], config=_DEFERRED)
+AlertListAdapter = TypeAdapter(List[Alert], config=_DEFERRED)
+SessionListAdapter = TypeAdapter(List[Session], config=_DEFERRED)
+
+
+def dump_records_json(records: List[HealthRecord]) -> bytes:
+    """Serialize health records to JSON bytes with pydantic-core's serializer."""
+    return HealthRecordListAdapter.dump_json(records)
+
+
+# Any alert / health record / surveillance log, dispatched on `kind` in one lookup
+Event = Annotated[Union[Alert, HealthRecord, SurveillanceLog], Field(discriminator="kind")]
+EventAdapter = TypeAdapter(Event, config=_DEFERRED)
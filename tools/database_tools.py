@@ -5,6 +5,8 @@ from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 import re
 import builtins
+from contextlib import contextmanager
+from contextvars import ContextVar
 from builtins import Exception,str,isinstance,float,int,list,set,len,any,bool
 from config.mongo import db
 from crewai.tools import tool
@@ -14,9 +16,11 @@ from database import (
     User,
     Session,
     HealthRecord,
+    HealthRecordRow,
     Alert,
     RiskLevel,
     SessionState,
+    dump_for_mongo,
 )
 from utils import log
 
@@ -40,12 +44,22 @@ sync_health_records = sync_db["health_records"]
 sync_alerts = sync_db["alerts"]
 
 
-# ========== HELPER FUNCTIONS ==========
+# Per-kickoff cache of get_user_session results (telegram_id -> JSON string).
+# Unset outside session_cache_scope(), so standalone tool calls always hit Mongo.
+_session_cache: ContextVar[Optional[Dict[str, str]]] = ContextVar("session_cache", default=None)
+
+
+@contextmanager
+def session_cache_scope():
+    """Share get_user_session results across the agents of one crew run"""
+    token = _session_cache.set({})
+    try:
+        yield
+    finally:
+        _session_cache.reset(token)
 
-def _model_dump(model):
-    """Dump Pydantic model to dict"""
-    return model.model_dump(by_alias=True, exclude_none=True)
 
+# ========== HELPER FUNCTIONS ==========
 
 def _run_async(coro):
     """
@@ -100,9 +114,8 @@ async def _ensure_session(telegram_id: str):
         telegram_id=telegram_id,
         session_state=SessionState.INITIAL,
     )
-    payload = _model_dump(session_model)
-    result = await sessions_collection.insert_one(payload)
-    payload["_id"] = result.inserted_id
+    payload = dump_for_mongo(session_model)
+    await sessions_collection.insert_one(payload)
     return payload
 
 
@@ -119,6 +132,11 @@ def get_user_session(telegram_id: str) -> str:
     Returns:
         str: JSON string with session data
     """
+    cache = _session_cache.get()
+    if cache is not None and telegram_id in cache:
+        log.debug(f"♻️ Session cache hit for {telegram_id}")
+        return cache[telegram_id]
+    
     try:
         # ✅ Use SYNC MongoDB (no async needed)
         user = sync_users.find_one({"telegram_id": telegram_id})
@@ -163,7 +181,10 @@ def get_user_session(telegram_id: str) -> str:
         }
         
         log.info(f"✅ Retrieved session for {telegram_id}")
-        return json.dumps(result, default=str)
+        payload = json.dumps(result, default=str)
+        if cache is not None:
+            cache[telegram_id] = payload
+        return payload
         
     except Exception as e:
         log.error(f"❌ Error getting session: {str(e)}")
@@ -309,38 +330,32 @@ def write_health_record(**kwargs) -> str:
         )
         
         # Create health record
-        record = {
-            "telegram_id": telegram_id,
-            "user_id": str(user["_id"]),
-            "session_id": str(session["_id"]) if session else None,
-            "symptoms": symptoms or [],
-            "symptom_details": symptom_details or {},
-            "risk_level": risk_level.upper(),
-            "severity_score": float(severity_score),
-            "location": location or user.get("location", "Unknown"),
-            "reported_at": datetime.utcnow(),
-            "temperature": temperature,
-            "has_fever": (temperature and temperature > 37.5) if temperature else ('fever' in str(symptoms).lower()),
-            "has_cough": 'cough' in str(symptoms).lower(),
-            "has_breathing_difficulty": any(term in str(symptoms).lower() for term in ['breath', 'breathing', 'shortness']),
-            "agent_assessment": agent_assessment or "Assessment completed",
-            "recommendations": recommendations or [],
-            "requires_followup": bool(requires_followup),
-            "created_at": datetime.utcnow()
-        }
-        
-        if followup_hours:
-            record["followup_date"] = datetime.utcnow() + timedelta(hours=int(followup_hours))
+        reported_at = datetime.utcnow()
+        record = HealthRecordRow(
+            telegram_id=telegram_id,
+            user_id=str(user["_id"]),
+            session_id=str(session["_id"]) if session else None,
+            symptoms=symptoms or [],
+            symptom_details=symptom_details or {},
+            risk_level=risk_level.upper(),
+            severity_score=float(severity_score),
+            location=location or user.get("location", "Unknown"),
+            reported_at=reported_at,
+            temperature=temperature,
+            agent_assessment=agent_assessment or "Assessment completed",
+            recommendations=recommendations or [],
+            requires_followup=bool(requires_followup),
+            followup_date=reported_at + timedelta(hours=int(followup_hours)) if followup_hours else None,
+            created_at=reported_at,
+        )
         
-        result = sync_health_records.insert_one(record)
+        result = sync_health_records.insert_one(record.to_mongo())
         
         log.info(f"✅ Health record created: ID={result.inserted_id}, Risk={risk_level.upper()}")
         return f"✅ SUCCESS: Health record saved (ID: {result.inserted_id}). Risk: {risk_level.upper()}, Severity: {severity_score}/10"
         
     except Exception as e:
-        log.error(f"❌ Error in write_health_record: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception(f"❌ Error in write_health_record: {str(e)}")
         return f"❌ ERROR: {str(e)}"
 
 
@@ -414,6 +429,11 @@ def update_session(
             {"$set": updates}
         )
         
+        # Later agents in this run must see the new state
+        cache = _session_cache.get()
+        if cache is not None:
+            cache.pop(telegram_id, None)
+        
         log.info(f"✅ Session updated for {telegram_id}")
         return f"✅ Session updated successfully for {telegram_id}"
         
@@ -447,33 +467,50 @@ def get_recent_symptoms(
         if location:
             query["location"] = location
         
-        records = list(
-            sync_health_records.find(query)
-            .sort("reported_at", -1)
-            .limit(limit)
-        )
-        
-        symptom_counts = {}
-        location_counts = {}
+        # Aggregate server-side; only the histograms and a few recent
+        # records come back instead of every raw document
+        pipeline = [
+            {"$match": query},
+            {"$sort": {"reported_at": -1}},
+            {"$limit": limit},
+            {"$project": {
+                "symptoms": 1,
+                "location": 1,
+                "risk_level": 1,
+                "reported_at": 1,
+                "severity_score": 1,
+            }},
+            {"$facet": {
+                "total": [{"$count": "n"}],
+                "symptoms": [
+                    {"$unwind": "$symptoms"},
+                    {"$group": {"_id": "$symptoms", "count": {"$sum": 1}}},
+                    {"$sort": {"count": -1}},
+                ],
+                "locations": [
+                    {"$match": {"location": {"$nin": [None, ""]}}},
+                    {"$group": {"_id": "$location", "count": {"$sum": 1}}},
+                ],
+                "risks": [
+                    {"$group": {"_id": "$risk_level", "count": {"$sum": 1}}},
+                ],
+                "recent": [{"$limit": 20}],  # Only return first 20 detailed records
+            }},
+        ]
+        facets = next(sync_health_records.aggregate(pipeline), {})
+        
+        total = facets.get("total") or [{"n": 0}]
+        total_records = total[0]["n"]
+        symptom_counts = {g["_id"]: g["count"] for g in facets.get("symptoms", [])}
+        location_counts = {g["_id"]: g["count"] for g in facets.get("locations", [])}
         risk_distribution = {'LOW': 0, 'MODERATE': 0, 'HIGH': 0, 'CRITICAL': 0}
-        
-        for record in records:
-            # Count symptoms
-            for symptom in record.get("symptoms", []):
-                symptom_counts[symptom] = symptom_counts.get(symptom, 0) + 1
-            
-            # Count locations
-            record_location = record.get("location")
-            if record_location:
-                location_counts[record_location] = location_counts.get(record_location, 0) + 1
-            
-            # Count risk levels
-            risk_value = record.get("risk_level", "MODERATE")
+        for group in facets.get("risks", []):
+            risk_value = group["_id"] or "MODERATE"
             if risk_value in risk_distribution:
-                risk_distribution[risk_value] += 1
+                risk_distribution[risk_value] += group["count"]
         
         result = {
-            'total_records': len(records),
+            'total_records': total_records,
             'time_window_hours': hours,
             'symptom_counts': symptom_counts,
             'location_counts': location_counts,
@@ -487,11 +524,11 @@ def get_recent_symptoms(
                     'reported_at': r.get('reported_at', datetime.utcnow()).isoformat(),
                     'severity_score': r.get('severity_score', 0)
                 }
-                for r in records[:20]  # Only return first 20 detailed records
+                for r in facets.get("recent", [])
             ]
         }
         
-        log.info(f"✅ Retrieved {len(records)} symptom records from last {hours} hours")
+        log.info(f"✅ Retrieved {total_records} symptom records from last {hours} hours")
         return json.dumps(result, default=str)
         
     except Exception as e:
@@ -1,9 +1,11 @@
 from crewai.tools import tool
 from typing import Optional, List, Dict, Any
-from database import health_records_collection, alerts_collection
+# Sync collections: CrewAI tools run outside the event loop
+from tools.database_tools import sync_health_records as health_records_collection, sync_alerts as alerts_collection
 from datetime import datetime, timedelta
 from utils.logger import log
 import json
+import re
 from builtins import str, bool, int, float, dict, list,len, Exception, sum, round
 
 
@@ -91,14 +93,11 @@ def detect_spike(
         end_time = datetime.utcnow() - timedelta(hours=time_window_hours)
         start_time = end_time - timedelta(days=7)
         
-        historical_records = list(health_records_collection.find({
-            "reported_at": {"$gte": start_time, "$lt": end_time}
-        }))
-        
-        historical_count = sum(
-            1 for r in historical_records 
-            if symptom.lower() in [s.lower() for s in r.get('symptoms', [])]
-        )
+        # Count matching reports server-side instead of scanning them in Python
+        historical_count = health_records_collection.count_documents({
+            "reported_at": {"$gte": start_time, "$lt": end_time},
+            "symptoms": {"$regex": f"^{re.escape(symptom)}$", "$options": "i"},
+        })
         
         # Calculate baseline
         num_windows = 7 * (24 / time_window_hours)
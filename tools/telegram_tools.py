@@ -3,12 +3,49 @@ from config import settings
 from utils import log
 from utils.translation import translate_text_sync
 from pymongo import MongoClient
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
 import requests
+import threading
+import time
 
 _mongo_client = MongoClient(settings.MONGODB_URL)
 _mongo_db = _mongo_client[settings.MONGODB_DB_NAME]
 _users_collection = _mongo_db["users"]
 
+# Telegram allows ~30 messages/second per bot
+_BROADCAST_CHUNK_SIZE = 30
+
+# Keep-alive session so broadcasts reuse TCP+TLS connections
+_http = requests.Session()
+_http.mount(
+    "https://",
+    requests.adapters.HTTPAdapter(pool_maxsize=_BROADCAST_CHUNK_SIZE),
+)
+
+
+# Cancellation flag of the crew run this tool call belongs to. Set by the crew
+# when a run times out, so the abandoned run stops messaging the user.
+_run_cancelled: ContextVar[Optional[threading.Event]] = ContextVar("run_cancelled", default=None)
+
+
+@contextmanager
+def cancellable_run(cancelled: threading.Event):
+    """Bind a cancellation event to the tool calls of one crew run"""
+    token = _run_cancelled.set(cancelled)
+    try:
+        yield
+    finally:
+        _run_cancelled.reset(token)
+
+
+def run_cancelled() -> bool:
+    """True if the current crew run has been abandoned"""
+    cancelled = _run_cancelled.get()
+    return cancelled is not None and cancelled.is_set()
+
 
 def _get_user_language(chat_id: str) -> str:
     try:
@@ -21,11 +58,32 @@ def _get_user_language(chat_id: str) -> str:
     return "en"
 
 
+def _get_user_languages(chat_ids: list) -> dict:
+    """Resolve preferred languages for many users in one query."""
+    languages = {str(chat_id): "en" for chat_id in chat_ids}
+    try:
+        cursor = _users_collection.find(
+            {"telegram_id": {"$in": list(languages)}},
+            {"telegram_id": 1, "preferred_language": 1},
+        )
+        for doc in cursor:
+            lang = doc.get("preferred_language")
+            if lang in ("en", "hi", "mr"):
+                languages[doc["telegram_id"]] = lang
+    except Exception as db_err:
+        log.warning("Unable to fetch languages for broadcast: %s", db_err)
+    return languages
+
+
 @tool("Send Telegram Message")
 def send_telegram_message(chat_id: str, message: str, parse_mode: str = "HTML") -> str:
     """
     Send a message to a user via Telegram.
     """
+    if run_cancelled():
+        log.warning(f"⏹️ Run cancelled, not sending message to {chat_id}")
+        return "❌ Run cancelled (timed out); message not sent"
+    
     try:
         # Detect user language
         language = _get_user_language(chat_id)
@@ -65,34 +123,42 @@ def broadcast_telegram_message(chat_ids: list, message: str) -> str:
     """
     Broadcast a message to multiple users via Telegram.
     """
+    if run_cancelled():
+        log.warning("⏹️ Run cancelled, not broadcasting")
+        return "❌ Run cancelled (timed out); broadcast not sent"
+    
     try:
         url = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
-        success_count = 0
+        languages = _get_user_languages(chat_ids)
 
-        for chat_id in chat_ids:
-            try:
-                language = _get_user_language(chat_id)
-
-                # Same translation logic with fallback
-                if language != "en":
-                    translated = translate_text_sync(message, language)
-                    text_to_send = translated if translated else message
-                else:
-                    text_to_send = message
+        # Translate once per language instead of once per recipient
+        texts = {"en": message}
+        for language in set(languages.values()) - {"en"}:
+            translated = translate_text_sync(message, language)
+            texts[language] = translated if translated else message
 
+        def _send(chat_id) -> bool:
+            try:
                 payload = {
                     "chat_id": chat_id,
-                    "text": text_to_send,
+                    "text": texts[languages[str(chat_id)]],
                     "parse_mode": "HTML"
                 }
-
-                response = requests.post(url, json=payload)
+                response = _http.post(url, json=payload)
                 response.raise_for_status()
-                success_count += 1
-
+                return True
             except Exception as e:
                 log.error(f"Failed to send to {chat_id}: {str(e)}")
-                continue
+                return False
+
+        success_count = 0
+        with ThreadPoolExecutor(max_workers=_BROADCAST_CHUNK_SIZE) as pool:
+            for start in range(0, len(chat_ids), _BROADCAST_CHUNK_SIZE):
+                if start:
+                    # Stay within Telegram's per-second rate limit
+                    time.sleep(1.0)
+                chunk = chat_ids[start:start + _BROADCAST_CHUNK_SIZE]
+                success_count += sum(pool.map(_send, chunk))
 
         log.info(f"Broadcast completed: {success_count}/{len(chat_ids)} successful")
         return f"Broadcast completed: {success_count}/{len(chat_ids)} messages sent successfully"
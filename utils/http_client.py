@@ -0,0 +1,36 @@
+# utils/http_client.py
+import asyncio
+import httpx
+
+# One pooled client per event loop; httpx clients must not cross loops
+_clients = {}
+
+
+def get_shared_httpx() -> httpx.AsyncClient:
+    """
+    Get the pooled AsyncClient for the running event loop.
+    
+    Reusing one client keeps TCP/TLS connections alive across outbound
+    calls instead of paying a handshake per request.
+    
+    Returns:
+        Shared httpx.AsyncClient bound to the current loop
+    """
+    key = id(asyncio.get_running_loop())
+    client = _clients.get(key)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            # TLS verify disabled to match the Telegram client (local proxy)
+            verify=False,
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+            timeout=httpx.Timeout(10.0),
+        )
+        _clients[key] = client
+    return client
+
+
+async def close_shared_httpx():
+    """Close the pooled client for the running event loop"""
+    client = _clients.pop(id(asyncio.get_running_loop()), None)
+    if client is not None:
+        await client.aclose()
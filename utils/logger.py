@@ -3,13 +3,18 @@ import sys
 from config import settings
 
 def setup_logger():
-    """Configure logger"""
+    """Configure logger
+    
+    Sinks use enqueue=True: log calls only put the record on a queue and a
+    background thread does the write, keeping I/O off the request path.
+    """
     logger.remove()
     
     # Console logging
     logger.add(
         sys.stdout,
         level=settings.LOG_LEVEL,
+        enqueue=True,
         format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> - <level>{message}</level>"
     )
     
@@ -19,6 +24,7 @@ def setup_logger():
         rotation="500 MB",
         retention="10 days",
         level=settings.LOG_LEVEL,
+        enqueue=True,
         format="{time:YYYY-MM-DD HH:mm:ss} | {level: <8} | {name}:{function} - {message}"
     )
     